@@ -0,0 +1,110 @@
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import argparse
+import time
+import pygame
+pygame.init()
+
+from level.tileset_loader import load_tileset
+from level.tile_type_enum import TileTypeEnum, DecoratorEnum
+from level.grid_generator_helper import Decoration
+
+# run from the repository root: python -m benchmarks.blit_benchmark
+
+def build_blit_list(tileset, screen_width: int, screen_height: int, zoom_level: int):
+    tile_types = [TileTypeEnum.SNOW_FLOOR, TileTypeEnum.STONE_TILES, TileTypeEnum.NEON_TILE, TileTypeEnum.BLANK, TileTypeEnum.WALL_TILE]
+    blits = []
+    for x in range(0, int(screen_width / zoom_level) + 1):
+        for y in range(0, int(screen_height / zoom_level) + 1):
+            tile = tileset.get_tile_for_type(tile_types[(x * 7 + y * 3) % len(tile_types)])
+            blits.append((tile, x * zoom_level, y * zoom_level, (x * 5 + y) % 256))
+    return blits
+
+
+def build_decoration_list(tileset, screen_width: int, screen_height: int, zoom_level: int):
+    # a tree on every other tile, about as dense as the thickest snow regions get
+    decorator = tileset.get_decorator_for_type(DecoratorEnum.TREE)
+    decorations = []
+    for x in range(0, int(screen_width / zoom_level) + 1, 2):
+        for y in range(0, int(screen_height / zoom_level) + 1, 2):
+            decorations.append(Decoration(x, y, decorator))
+    return decorations
+
+
+def run_individual_blits(screen, blits, zoom_level: int, frames: int) -> float:
+    start_time = time.perf_counter()
+    for frame in range(0, frames):
+        for tile, x_pos, y_pos, connection_mask in blits:
+            tile.render(x_pos, y_pos, zoom_level, zoom_level, screen, connection_mask)
+    return time.perf_counter() - start_time
+
+
+def run_batched_blits(screen, blits, zoom_level: int, frames: int) -> float:
+    # builds the (source, dest, area) list the way TerrainChunkCache does, rebuilt every frame so list building is part of the cost
+    start_time = time.perf_counter()
+    tiles = list(set([tile for tile, x_pos, y_pos, connection_mask in blits]))
+    for frame in range(0, frames):
+        # each tile's current image is looked up once per frame rather than once per cell, as the chunk cache does per step
+        frame_images = {tile: tile.rendered_images[tile.get_current_frame()] for tile in tiles}
+        screen.blits([(frame_images[tile], (x_pos, y_pos), tile.rendered_areas[connection_mask]) for tile, x_pos, y_pos, connection_mask in blits], doreturn=False)
+    return time.perf_counter() - start_time
+
+
+def run_individual_decoration_blits(screen, decorations, zoom_level: int, frames: int) -> float:
+    start_time = time.perf_counter()
+    for frame in range(0, frames):
+        for decoration in decorations:
+            decoration.render(0, 0, zoom_level, screen)
+    return time.perf_counter() - start_time
+
+
+def run_batched_decoration_blits(screen, decorations, zoom_level: int, frames: int) -> float:
+    # the list is built every frame the way Grid.render_decorations builds it
+    start_time = time.perf_counter()
+    for frame in range(0, frames):
+        screen.blits([decoration.get_blit(0, 0, zoom_level) for decoration in decorations], doreturn=False)
+    return time.perf_counter() - start_time
+
+
+def compare(name: str, screen, items, zoom_level: int, frames: int, repeats: int, run_individual, run_batched):
+    # the two are run in turn and the best of each kept, so a busy moment on the machine does not land on only one of them
+    individual_time = None
+    batched_time = None
+    for repeat in range(0, repeats):
+        repeat_individual_time = run_individual(screen, items, zoom_level, frames)
+        repeat_batched_time = run_batched(screen, items, zoom_level, frames)
+        individual_time = repeat_individual_time if individual_time is None else min(individual_time, repeat_individual_time)
+        batched_time = repeat_batched_time if batched_time is None else min(batched_time, repeat_batched_time)
+
+    blit_count = len(items) * frames
+    print(name + " blits per frame: " + str(len(items)) + ", frames: " + str(frames) + ", best of " + str(repeats))
+    print("individual blits: " + str(int(blit_count / individual_time)) + " blits/sec")
+    print("batched blits:    " + str(int(blit_count / batched_time)) + " blits/sec")
+    print("speed up:         " + str(round(individual_time / batched_time, 2)) + "x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="compare per-tile and per-decoration Surface.blit calls with one Surface.blits call over a list")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--zoom", type=int, default=20)
+    parser.add_argument("--width", type=int, default=1200)
+    parser.add_argument("--height", type=int, default=800)
+    parser.add_argument("--repeats", type=int, default=5)
+    arguments = parser.parse_args()
+
+    if arguments.repeats < 1:
+        raise ValueError("repeats must be a whole number more than 0. provided: " + str(arguments.repeats))
+
+    screen = pygame.display.set_mode([arguments.width, arguments.height])
+    tileset = load_tileset("test_tileset.json")
+    tileset.update_renders(arguments.zoom)
+    blits = build_blit_list(tileset, arguments.width, arguments.height, arguments.zoom)
+    decorations = build_decoration_list(tileset, arguments.width, arguments.height, arguments.zoom)
+
+    compare("tile", screen, blits, arguments.zoom, arguments.frames, arguments.repeats, run_individual_blits, run_batched_blits)
+    compare("decoration", screen, decorations, arguments.zoom, arguments.frames, arguments.repeats, run_individual_decoration_blits, run_batched_decoration_blits)
+
+
+if __name__ == "__main__":
+    main()
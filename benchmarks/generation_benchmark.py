@@ -0,0 +1,125 @@
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import argparse
+import hashlib
+import json
+import platform
+import numpy as np
+import pygame
+pygame.init()
+
+from level.tileset_loader import load_tileset
+from level.grid_generator_helper import GridGenerator, MazeGenerator
+from level.level import LevelData
+
+# run from the repository root: python -m benchmarks.generation_benchmark --output results.json
+# the json files from two commits can be diffed to spot a regression in any stage
+
+def parse_sizes(sizes: str):
+    parsed_sizes = []
+    for size in sizes.split(","):
+        width, height = size.lower().split("x")
+        parsed_sizes.append((int(width), int(height)))
+    return parsed_sizes
+
+
+def get_checksum(tile_types: np.ndarray, collision_grid: np.ndarray, decorations) -> str:
+    level_data = LevelData.from_generated(tile_types, collision_grid, decorations, {})
+    checksum = hashlib.sha256()
+    checksum.update(np.ascontiguousarray(level_data.tile_types).tobytes())
+    checksum.update(np.ascontiguousarray(level_data.collision_grid).tobytes())
+    checksum.update(level_data.decorations.tobytes())
+    return checksum.hexdigest()
+
+
+def run_generation(tileset, width: int, height: int, seed: int, track_allocations: bool):
+    generator = MazeGenerator(width, height, tileset, seed = seed, track_allocations = track_allocations)
+    storage, collision_grid, decorations = generator.generate_grid()
+    return generator.pipeline.get_report(), get_checksum(storage.tile_types, collision_grid, decorations)
+
+
+def benchmark_level(tileset, width: int, height: int, seed: int, repeats: int, measure_memory: bool):
+    # stage times are the best of the repeats, allocations come from one extra run because tracing slows everything down
+    stage_times = {}
+    checksum = None
+    for repeat in range(0, repeats):
+        report, run_checksum = run_generation(tileset, width, height, seed, False)
+        if checksum is not None and run_checksum != checksum:
+            raise ValueError("generation is not deterministic for seed " + str(seed) + " at " + str(width) + "x" + str(height))
+        checksum = run_checksum
+        for stage in report["stages"]:
+            stage_times[stage["name"]] = min(stage_times.get(stage["name"], stage["wall_time"]), stage["wall_time"])
+
+    stage_allocations = {}
+    if measure_memory:
+        report, run_checksum = run_generation(tileset, width, height, seed, True)
+        for stage in report["stages"]:
+            stage_allocations[stage["name"]] = stage
+
+    stages = []
+    for stage in report["stages"]:
+        stage_result = {"name": stage["name"], "wall_time": stage_times[stage["name"]], "cells_touched": stage["cells_touched"]}
+        if measure_memory:
+            stage_result["allocated_bytes"] = stage_allocations[stage["name"]]["allocated_bytes"]
+            stage_result["peak_allocated_bytes"] = stage_allocations[stage["name"]]["peak_allocated_bytes"]
+        stages.append(stage_result)
+
+    result = {
+        "width": width,
+        "height": height,
+        "seed": seed,
+        "checksum": checksum,
+        "total_wall_time": sum([stage["wall_time"] for stage in stages]),
+        "stages": stages
+    }
+    if measure_memory:
+        result["peak_allocated_bytes"] = max([stage["peak_allocated_bytes"] for stage in stages])
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="time each stage of MazeGenerator headless over fixed sizes and seeds")
+    parser.add_argument("--sizes", type=str, default="100x100,300x200,1000x1000,2000x2000")
+    parser.add_argument("--seeds", type=str, default="1,2,3")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--tileset", type=str, default="test_tileset.json")
+    parser.add_argument("--no-memory", action="store_true", help="skip the extra traced run that measures allocations")
+    parser.add_argument("--output", type=str, default=None, help="json file the results are written to")
+    arguments = parser.parse_args()
+
+    if arguments.repeats < 1:
+        raise ValueError("repeats must be a whole number more than 0. provided: " + str(arguments.repeats))
+
+    tileset = load_tileset(arguments.tileset)
+    seeds = [int(seed) for seed in arguments.seeds.split(",")]
+    measure_memory = not arguments.no_memory
+
+    results = []
+    for width, height in parse_sizes(arguments.sizes):
+        for seed in seeds:
+            result = benchmark_level(tileset, width, height, seed, arguments.repeats, measure_memory)
+            results.append(result)
+
+            summary = str(width) + "x" + str(height) + " seed " + str(seed) + ": " + str(round(result["total_wall_time"] * 1000, 1)) + " ms"
+            if measure_memory:
+                summary = summary + ", peak " + str(round(result["peak_allocated_bytes"] / (1024 * 1024), 1)) + " MiB"
+            print(summary + ", checksum " + result["checksum"][:16])
+            for stage in result["stages"]:
+                print("    " + stage["name"].ljust(20) + str(round(stage["wall_time"] * 1000, 2)).rjust(10) + " ms")
+
+    if arguments.output is not None:
+        with open(arguments.output, "w") as output_file:
+            output_file.write(json.dumps({
+                "generator_version": GridGenerator.generator_version,
+                "python_version": platform.python_version(),
+                "numpy_version": np.__version__,
+                "tileset": arguments.tileset,
+                "repeats": arguments.repeats,
+                "results": results
+            }, indent = 4))
+        print("results written to " + arguments.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -26,5 +26,5 @@ class KeyBoard():
     def get_key_state(key) -> KeyState:
         return KeyState(
             KeyBoard.key_state[key],
-            KeyBoard.key_state[key] == KeyBoard.old_state[key]
+            KeyBoard.key_state[key] != KeyBoard.old_state[key]
         )
\ No newline at end of file
@@ -0,0 +1,40 @@
+import math
+from typing import Tuple
+
+class Camera():
+
+    def __init__(self, x_pos: float = 0, y_pos: float = 0, zoom_level: int = 20, screen_width: int = 0, screen_height: int = 0):
+        self.x_pos = x_pos
+        self.y_pos = y_pos
+        self.zoom_level = zoom_level
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+
+    def set_screen_size(self, screen_width: int, screen_height: int):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+
+    def move(self, x_change: float, y_change: float):
+        self.x_pos = self.x_pos + x_change
+        self.y_pos = self.y_pos + y_change
+
+    def world_to_screen(self, x_pos: float, y_pos: float) -> Tuple[float, float]:
+        return x_pos * self.zoom_level - self.x_pos, y_pos * self.zoom_level - self.y_pos
+
+    def is_rect_visible(self, screen_x: float, screen_y: float, width: float, height: float) -> bool:
+        return screen_x + width >= 0 and screen_x <= self.screen_width and\
+             screen_y + height >= 0 and screen_y <= self.screen_height
+
+    def get_visible_range(self, cell_size: int, column_count: int, row_count: int, margin: int = 0) -> Tuple[int, int, int, int]:
+        # returns start and end (exclusive) column then row of the cells of cell_size tiles that touch the screen
+        cell_pixel_size = cell_size * self.zoom_level
+
+        start_x = max(0, math.ceil(self.x_pos / cell_pixel_size) - 1 - margin)
+        end_x = min(column_count, math.floor((self.x_pos + self.screen_width) / cell_pixel_size) + 1 + margin)
+        start_y = max(0, math.ceil(self.y_pos / cell_pixel_size) - 1 - margin)
+        end_y = min(row_count, math.floor((self.y_pos + self.screen_height) / cell_pixel_size) + 1 + margin)
+
+        return start_x, max(start_x, end_x), start_y, max(start_y, end_y)
+
+    def get_visible_tile_range(self, grid_width: int, grid_height: int, margin: int = 0) -> Tuple[int, int, int, int]:
+        return self.get_visible_range(1, grid_width, grid_height, margin)
@@ -0,0 +1,328 @@
+import os
+import math
+import numpy as np
+from random import Random, randrange
+from time import perf_counter
+from typing import Dict, List, Set, Tuple
+from level.grid import Grid
+from level.level import LevelData, save_level
+from level.level_cache import LevelCache
+from level.tileset_loader import load_tileset, TileSet
+from level.tile_type_enum import TileTypeEnum
+from level.grid_storage import GridStorage
+from level.grid_generator_helper import Decoration
+from registries.collision_registry import CollisionRegistry
+from registries.dirty_rect_registry import DirtyRectRegistry
+
+class ChunkedGrid(Grid):
+
+    # a world with no edges made of chunk_size square grids, each generated from the world seed and its own coordinate
+    # only the chunks near the camera are held, so memory and generation follow the area explored rather than the size of the world
+
+    def __init__(self, tileset_filename: str, seed: int = None, chunk_size: int = 128, load_distance: int = 1, keep_distance: int = 2, chunk_directory: str = None, incremental: bool = False, tileset: TileSet = None):
+        if chunk_size < 16:
+            raise ValueError("chunk_size must be a whole number of at least 16. provided: " + str(chunk_size))
+        if load_distance < 0:
+            raise ValueError("load_distance must be a whole number of at least 0. provided: " + str(load_distance))
+        if keep_distance < load_distance:
+            raise ValueError("keep_distance must be at least load_distance. provided: " + str(keep_distance))
+
+        self.chunk_size = chunk_size
+        # chunks within load_distance chunks of the screen are loaded, ones further than keep_distance are evicted
+        self.load_distance = load_distance
+        self.keep_distance = keep_distance
+        # when set, evicted chunks are written here and loaded back rather than generated again, otherwise they are dropped along with any edits
+        self.chunk_cache = LevelCache(chunk_directory) if chunk_directory is not None else None
+        self.chunk_loading_budget = 0.004
+
+        self.chunks: Dict[Tuple[int, int], Grid] = {}
+        self.loading_chunks: Dict[Tuple[int, int], Grid] = {}
+        self.modified_chunks: Set[Tuple[int, int]] = set()
+        # evicted chunks waiting to be written to chunk_directory, one is written a frame
+        self.saving_chunks: Dict[Tuple[int, int], Grid] = {}
+        self.active = False
+        self.collision_window_changed = False
+        # steps through baking the terrain of the chunks on screen, picked up again each frame until it runs out
+        self.terrain_steps = None
+
+        super().__init__(chunk_size, chunk_size, tileset_filename, None, incremental, seed if seed is not None else randrange(0, 2 ** 32), tileset)
+
+    def build_in_steps(self, width: int, height: int, level_data: None, seed: int):
+        self.seed = seed
+        if self.tileset is None:
+            self.tileset = load_tileset(self.tileset_filename)
+        self.tileset.update_renders(self.camera.zoom_level)
+        yield
+
+        # the chunks around the camera are in place before the world is first shown
+        for chunk_key in self.get_chunks_in_range(self.load_distance):
+            self.start_loading_chunk(chunk_key)
+        for chunk_key in list(self.loading_chunks.keys()):
+            yield from self.loading_chunks[chunk_key].loading_steps
+            self.finish_loading_chunk(chunk_key)
+
+    def activate(self):
+        Grid.current_tileset = self.tileset
+        self.active = True
+        collision = CollisionRegistry.get_instance()
+        self.register_collision_window()
+        for chunk_key, chunk in self.chunks.items():
+            collision.register_decorators(chunk.decorations, chunk_key[0] * self.chunk_size, chunk_key[1] * self.chunk_size)
+
+    def get_chunk_seed(self, chunk_key: Tuple[int, int]) -> int:
+        return Random(str(self.seed) + ":" + str(chunk_key[0]) + ":" + str(chunk_key[1])).getrandbits(32)
+
+    def get_chunk_range(self, distance: int) -> Tuple[int, int, int, int]:
+        # start and end (exclusive) column then row of the chunks within distance chunks of the screen
+        chunk_pixel_size = self.chunk_size * self.camera.zoom_level
+        start_x = math.floor(self.camera.x_pos / chunk_pixel_size) - distance
+        end_x = math.floor((self.camera.x_pos + self.camera.screen_width) / chunk_pixel_size) + 1 + distance
+        start_y = math.floor(self.camera.y_pos / chunk_pixel_size) - distance
+        end_y = math.floor((self.camera.y_pos + self.camera.screen_height) / chunk_pixel_size) + 1 + distance
+        return start_x, end_x, start_y, end_y
+
+    def get_chunks_in_range(self, distance: int) -> List[Tuple[int, int]]:
+        start_x, end_x, start_y, end_y = self.get_chunk_range(distance)
+        return [(chunk_x, chunk_y) for chunk_x in range(start_x, end_x) for chunk_y in range(start_y, end_y)]
+
+    def is_chunk_in_range(self, chunk_key: Tuple[int, int], distance: int) -> bool:
+        start_x, end_x, start_y, end_y = self.get_chunk_range(distance)
+        return start_x <= chunk_key[0] < end_x and start_y <= chunk_key[1] < end_y
+
+    def get_chunk_distance(self, chunk_key: Tuple[int, int]) -> float:
+        chunk_pixel_size = self.chunk_size * self.camera.zoom_level
+        centre_x = (self.camera.x_pos + self.camera.screen_width / 2) / chunk_pixel_size - 0.5
+        centre_y = (self.camera.y_pos + self.camera.screen_height / 2) / chunk_pixel_size - 0.5
+        return (chunk_key[0] - centre_x) ** 2 + (chunk_key[1] - centre_y) ** 2
+
+    def sync_chunk_camera(self, chunk_key: Tuple[int, int], chunk: Grid):
+        # each chunk draws itself through a camera shifted to its corner of the world
+        chunk.camera.x_pos = self.camera.x_pos - chunk_key[0] * self.chunk_size * self.camera.zoom_level
+        chunk.camera.y_pos = self.camera.y_pos - chunk_key[1] * self.chunk_size * self.camera.zoom_level
+        chunk.camera.zoom_level = self.camera.zoom_level
+        chunk.camera.set_screen_size(self.camera.screen_width, self.camera.screen_height)
+
+    def start_loading_chunk(self, chunk_key: Tuple[int, int]):
+        if chunk_key in self.saving_chunks.keys():
+            # a chunk scrolled back into range before it was written is taken back as it is, it has nothing left to load
+            self.loading_chunks[chunk_key] = self.saving_chunks.pop(chunk_key)
+            return
+
+        chunk_seed = self.get_chunk_seed(chunk_key)
+        level_data = None
+        if self.chunk_cache is not None:
+            level_data = self.chunk_cache.load(chunk_seed, self.chunk_size, self.chunk_size, self.tileset_filename)
+
+        chunk = Grid(self.chunk_size, self.chunk_size, self.tileset_filename, level_data, True, chunk_seed, self.tileset)
+        self.sync_chunk_camera(chunk_key, chunk)
+        self.loading_chunks[chunk_key] = chunk
+
+    def finish_loading_chunk(self, chunk_key: Tuple[int, int]):
+        chunk = self.loading_chunks.pop(chunk_key)
+        self.chunks[chunk_key] = chunk
+        if self.active:
+            CollisionRegistry.get_instance().register_decorators(chunk.decorations, chunk_key[0] * self.chunk_size, chunk_key[1] * self.chunk_size)
+        self.collision_window_changed = True
+        DirtyRectRegistry.mark_full_redraw()
+
+    def evict_chunk(self, chunk_key: Tuple[int, int]):
+        if chunk_key in self.loading_chunks.keys():
+            del self.loading_chunks[chunk_key]
+            return
+
+        chunk = self.chunks.pop(chunk_key)
+        if self.chunk_cache is not None:
+            self.saving_chunks[chunk_key] = chunk
+        else:
+            self.modified_chunks.discard(chunk_key)
+
+        if self.active:
+            CollisionRegistry.get_instance().unregister_decorators(chunk.decorations)
+        self.collision_window_changed = True
+
+    def save_chunk(self, chunk_key: Tuple[int, int], chunk: Grid):
+        # untouched chunks already on disk are left there, anything else is written so it comes back as it was left
+        chunk_filename = self.chunk_cache.get_level_filename(chunk.seed, self.chunk_size, self.chunk_size, self.tileset_filename)
+        if chunk_key in self.modified_chunks or not os.path.exists(chunk_filename):
+            self.chunk_cache.save(chunk.seed, self.chunk_size, self.chunk_size, self.tileset_filename, chunk.get_level_data())
+        self.modified_chunks.discard(chunk_key)
+
+    def build_visible_terrain_in_steps(self):
+        # the chunks nearest the middle of the screen are baked first, chunks evicted or scrolled away in the meantime are passed over
+        visible_chunk_keys = [chunk_key for chunk_key in self.get_chunks_in_range(0) if chunk_key in self.chunks.keys()]
+        for chunk_key in sorted(visible_chunk_keys, key = self.get_chunk_distance):
+            if chunk_key not in self.chunks.keys() or not self.is_chunk_in_range(chunk_key, 0):
+                continue
+            chunk = self.chunks[chunk_key]
+            self.sync_chunk_camera(chunk_key, chunk)
+            for step in chunk.terrain_cache.build_visible_chunks_in_steps(chunk.camera):
+                yield
+                if chunk_key not in self.chunks.keys():
+                    break
+
+    def update_streaming(self):
+        for chunk_key in list(self.chunks.keys()) + list(self.loading_chunks.keys()):
+            if not self.is_chunk_in_range(chunk_key, self.keep_distance):
+                self.evict_chunk(chunk_key)
+
+        for chunk_key in self.get_chunks_in_range(self.load_distance):
+            if chunk_key not in self.chunks.keys() and chunk_key not in self.loading_chunks.keys():
+                self.start_loading_chunk(chunk_key)
+
+        # terrain for chunks already on screen is baked before more chunks are written or loaded, all share a few milliseconds a frame
+        end_time = perf_counter() + self.chunk_loading_budget
+        terrain_baked = False
+        while perf_counter() < end_time:
+            if self.terrain_steps is None:
+                self.terrain_steps = self.build_visible_terrain_in_steps()
+            try:
+                next(self.terrain_steps)
+                terrain_baked = True
+            except StopIteration:
+                self.terrain_steps = None
+                break
+        if terrain_baked:
+            DirtyRectRegistry.mark_full_redraw()
+
+        # writing a chunk cannot be split, so at most one goes a frame and only once the terrain is done
+        if len(self.saving_chunks) > 0 and perf_counter() < end_time:
+            chunk_key = next(iter(self.saving_chunks.keys()))
+            self.save_chunk(chunk_key, self.saving_chunks.pop(chunk_key))
+
+        # the chunk nearest the middle of the screen is built first
+        while len(self.loading_chunks) > 0 and perf_counter() < end_time:
+            chunk_key = min(self.loading_chunks.keys(), key = self.get_chunk_distance)
+            self.sync_chunk_camera(chunk_key, self.loading_chunks[chunk_key])
+            if self.loading_chunks[chunk_key].continue_loading(end_time - perf_counter()):
+                self.finish_loading_chunk(chunk_key)
+
+        if self.collision_window_changed and self.active:
+            self.register_collision_window()
+
+    def register_collision_window(self):
+        # the collision grid covers the box around the loaded chunks, the gaps between them count as solid like anything past the edge
+        self.collision_window_changed = False
+        collision = CollisionRegistry.get_instance()
+        if len(self.chunks) == 0:
+            collision.register_grid(np.zeros((0, 0), dtype=bool))
+            return
+
+        start_x, end_x, start_y, end_y = self.get_loaded_chunk_range()
+        collision_window = np.ones(((end_x - start_x) * self.chunk_size, (end_y - start_y) * self.chunk_size), dtype=bool)
+        for (chunk_x, chunk_y), chunk in self.chunks.items():
+            window_x = (chunk_x - start_x) * self.chunk_size
+            window_y = (chunk_y - start_y) * self.chunk_size
+            collision_window[window_x:window_x + self.chunk_size, window_y:window_y + self.chunk_size] = chunk.collision_grid
+        collision.register_grid(collision_window, start_x * self.chunk_size, start_y * self.chunk_size)
+
+    def update_terrain(self):
+        self.update_streaming()
+        for chunk_key, chunk in self.chunks.items():
+            self.sync_chunk_camera(chunk_key, chunk)
+            # terrain not baked yet is left to update_streaming rather than built here in one go
+            chunk.update_terrain(False)
+
+    def render_terrain(self, screen, build_missing: bool = False):
+        # terrain not baked yet is left to update_streaming, so a chunk can show up a few frames before its ground does
+        for chunk_key in self.get_chunks_in_range(0):
+            if chunk_key in self.chunks.keys():
+                chunk = self.chunks[chunk_key]
+                self.sync_chunk_camera(chunk_key, chunk)
+                chunk.render_terrain(screen, build_missing)
+
+    def render_decorations(self, screen):
+        # decorations can overhang into the next chunk, so the chunks just past the screen add theirs as well, all in one Surface.blits call
+        decoration_blits = []
+        for chunk_key in self.get_chunks_in_range(1):
+            if chunk_key in self.chunks.keys():
+                chunk = self.chunks[chunk_key]
+                self.sync_chunk_camera(chunk_key, chunk)
+                decoration_blits.extend(chunk.get_decoration_blits())
+        screen.blits(decoration_blits, doreturn=False)
+
+    def get_visible_decorations(self) -> List[Decoration]:
+        # chunks hold their decorations in their own coordinates, so these are copies moved to where they sit in the world
+        visible_decorations = []
+        for chunk_key in self.get_chunks_in_range(1):
+            if chunk_key in self.chunks.keys():
+                chunk = self.chunks[chunk_key]
+                self.sync_chunk_camera(chunk_key, chunk)
+                visible_decorations.extend(self.get_decorations_moved_by(chunk.get_visible_decorations(), chunk_key[0] * self.chunk_size, chunk_key[1] * self.chunk_size))
+        return visible_decorations
+
+    def get_decorations_moved_by(self, decorations: List[Decoration], x_offset: int, y_offset: int) -> List[Decoration]:
+        return [Decoration(decoration.x_pos + x_offset, decoration.y_pos + y_offset, decoration.type, decoration.out_of_bounds, decoration.id) for decoration in decorations]
+
+    def get_loaded_chunk_range(self) -> Tuple[int, int, int, int]:
+        # start and end (exclusive) column then row of the box around the loaded chunks
+        start_x = min([chunk_x for chunk_x, chunk_y in self.chunks.keys()])
+        end_x = max([chunk_x for chunk_x, chunk_y in self.chunks.keys()]) + 1
+        start_y = min([chunk_y for chunk_x, chunk_y in self.chunks.keys()])
+        end_y = max([chunk_y for chunk_x, chunk_y in self.chunks.keys()]) + 1
+        return start_x, end_x, start_y, end_y
+
+    def get_chunk_key(self, x: int, y: int) -> Tuple[int, int]:
+        return (x // self.chunk_size, y // self.chunk_size)
+
+    def set_tile(self, x: int, y: int, tile_type: TileTypeEnum):
+        chunk_key = self.get_chunk_key(x, y)
+        if chunk_key not in self.chunks.keys():
+            raise ValueError("tile is not in a loaded chunk. provided: " + str(x) + " " + str(y))
+
+        self.chunks[chunk_key].set_tile(x - chunk_key[0] * self.chunk_size, y - chunk_key[1] * self.chunk_size, tile_type)
+        self.modified_chunks.add(chunk_key)
+
+    def get_connection_mask(self, x: int, y: int) -> int:
+        chunk_key = self.get_chunk_key(x, y)
+        if chunk_key not in self.chunks.keys():
+            raise ValueError("tile is not in a loaded chunk. provided: " + str(x) + " " + str(y))
+
+        return self.chunks[chunk_key].get_connection_mask(x - chunk_key[0] * self.chunk_size, y - chunk_key[1] * self.chunk_size)
+
+    def update_connection_masks_in_steps(self):
+        for chunk in list(self.chunks.values()):
+            yield from chunk.update_connection_masks_in_steps()
+            chunk.terrain_cache.invalidate_all()
+        DirtyRectRegistry.mark_full_redraw()
+
+    def save(self, level_filename: str = None):
+        # given a level_filename the loaded chunks are written as one level, otherwise every chunk loaded or waiting to be written goes through chunk_directory
+        if level_filename is not None:
+            save_level(level_filename, self.get_level_data())
+            return
+        if self.chunk_cache is None:
+            raise ValueError("a chunked world can only be saved without a level_filename when it was given a chunk_directory")
+
+        for chunk_key in list(self.saving_chunks.keys()):
+            self.save_chunk(chunk_key, self.saving_chunks.pop(chunk_key))
+        for chunk_key, chunk in self.chunks.items():
+            self.save_chunk(chunk_key, chunk)
+
+    def get_level_data(self) -> LevelData:
+        # the box around the loaded chunks as one level, gaps between them are blank and solid like the collision window
+        # origin_x and origin_y record the world tile the level starts at
+        if len(self.chunks) == 0:
+            raise ValueError("a chunked world needs at least one loaded chunk to make level data from")
+
+        start_x, end_x, start_y, end_y = self.get_loaded_chunk_range()
+        tile_types = np.full(((end_x - start_x) * self.chunk_size, (end_y - start_y) * self.chunk_size), GridStorage.palette_indices[TileTypeEnum.BLANK], dtype=np.uint8)
+        collision_grid = np.ones(tile_types.shape, dtype=bool)
+        decorations = []
+        for (chunk_x, chunk_y), chunk in self.chunks.items():
+            window_x = (chunk_x - start_x) * self.chunk_size
+            window_y = (chunk_y - start_y) * self.chunk_size
+            tile_types[window_x:window_x + self.chunk_size, window_y:window_y + self.chunk_size] = chunk.storage.tile_types
+            collision_grid[window_x:window_x + self.chunk_size, window_y:window_y + self.chunk_size] = chunk.collision_grid
+            decorations.extend(self.get_decorations_moved_by(chunk.decorations, window_x, window_y))
+
+        metadata = {"tileset_filename": self.tileset_filename, "seed": self.seed, "origin_x": start_x * self.chunk_size, "origin_y": start_y * self.chunk_size, "chunk_size": self.chunk_size}
+        return LevelData.from_generated(tile_types, collision_grid, decorations, metadata)
+
+    def random_grid(self):
+        # only the loaded chunks are filled, chunks loaded later are generated from the seed as usual
+        for chunk_key, chunk in self.chunks.items():
+            chunk.random_grid()
+            self.modified_chunks.add(chunk_key)
+
+    def get_loaded_bytes(self) -> int:
+        return sum([chunk.storage.tile_types.nbytes + chunk.collision_grid.nbytes + chunk.connection_masks.nbytes for chunk in self.chunks.values()])
@@ -0,0 +1,157 @@
+import json
+import types
+import tracemalloc
+import numpy as np
+from time import perf_counter
+from typing import Any, Callable, Dict, List
+from level.grid_storage import GridStorage
+
+class GenerationStage():
+
+    def __init__(self, name: str, function: Callable, inputs: List[str], outputs: List[str]):
+        self.name = name
+        # called with the inputs as keyword arguments, returns one value per output in the same order
+        # a stage written as a generator can yield partway through and return its outputs when it finishes
+        self.function = function
+        self.inputs = inputs
+        self.outputs = outputs
+
+
+class StageReport():
+
+    def __init__(self, name: str, wall_time: float, allocated_bytes: int, peak_allocated_bytes: int, cells_touched: int):
+        self.name = name
+        self.wall_time = wall_time
+        self.allocated_bytes = allocated_bytes
+        self.peak_allocated_bytes = peak_allocated_bytes
+        self.cells_touched = cells_touched
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "wall_time": self.wall_time,
+            "allocated_bytes": self.allocated_bytes,
+            "peak_allocated_bytes": self.peak_allocated_bytes,
+            "cells_touched": self.cells_touched
+        }
+
+
+class GenerationPipeline():
+
+    def __init__(self, stages: List[GenerationStage], track_allocations: bool = False):
+        self.stages = stages
+        # tracemalloc slows every allocation down, so allocations are only measured when asked for
+        self.track_allocations = track_allocations
+        self.reports: List[StageReport] = []
+
+    def validate(self, available_names: List[str]):
+        available_names = set(available_names)
+        for stage in self.stages:
+            for input_name in stage.inputs:
+                if input_name not in available_names:
+                    raise ValueError("stage " + stage.name + " needs " + input_name + " which no earlier stage provides")
+            available_names.update(stage.outputs)
+
+    def run(self, state: Dict[str, Any], progress_callback: Callable[[float, str], None] = None) -> Dict[str, Any]:
+        for step in self.run_in_steps(state, progress_callback):
+            pass
+        return state
+
+    def run_in_steps(self, state: Dict[str, Any], progress_callback: Callable[[float, str], None] = None):
+        # yields after every stage so a caller can spread generation over frames, state holds the results once it is exhausted
+        self.validate(list(state.keys()))
+        self.reports = []
+
+        started_tracing = self.track_allocations and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+
+        try:
+            for index, stage in enumerate(self.stages):
+                if progress_callback is not None:
+                    progress_callback(index / len(self.stages), stage.name)
+                yield from self.run_stage_in_steps(stage, state)
+                yield
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+
+        if progress_callback is not None:
+            progress_callback(1, "done")
+
+    def run_stage_in_steps(self, stage: GenerationStage, state: Dict[str, Any]):
+        before = {name: GenerationPipeline.snapshot(state[name]) for name in stage.outputs if name in state.keys()}
+
+        if self.track_allocations:
+            tracemalloc.reset_peak()
+            starting_allocated_bytes = tracemalloc.get_traced_memory()[0]
+
+        start_time = perf_counter()
+        results = stage.function(**{name: state[name] for name in stage.inputs})
+        wall_time = perf_counter() - start_time
+
+        if isinstance(results, types.GeneratorType):
+            # only the time spent inside the stage counts, allocations made by whatever ran while it was paused are included
+            stage_steps = results
+            while True:
+                start_time = perf_counter()
+                try:
+                    next(stage_steps)
+                except StopIteration as finished:
+                    wall_time = wall_time + perf_counter() - start_time
+                    results = finished.value
+                    break
+                wall_time = wall_time + perf_counter() - start_time
+                yield
+
+        allocated_bytes = 0
+        peak_allocated_bytes = 0
+        if self.track_allocations:
+            current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+            allocated_bytes = current_bytes - starting_allocated_bytes
+            peak_allocated_bytes = peak_bytes - starting_allocated_bytes
+
+        if len(stage.outputs) == 1:
+            results = (results,)
+        if len(stage.outputs) > 0 and (results is None or len(results) != len(stage.outputs)):
+            raise ValueError("stage " + stage.name + " must return one value for each of its outputs: " + str(stage.outputs))
+
+        cells_touched = 0
+        for name, result in zip(stage.outputs, results):
+            cells_touched = cells_touched + GenerationPipeline.count_cells_touched(before.get(name), result)
+            state[name] = result
+
+        self.reports.append(StageReport(stage.name, wall_time, allocated_bytes, peak_allocated_bytes, cells_touched))
+
+    @staticmethod
+    def snapshot(value: Any) -> Any:
+        if isinstance(value, GridStorage):
+            return value.tile_types.copy()
+        if isinstance(value, np.ndarray):
+            return value.copy()
+        if isinstance(value, list):
+            return len(value)
+        return None
+
+    @staticmethod
+    def count_cells_touched(before: Any, after: Any) -> int:
+        # grids count the cells whose value changed, or every cell when a new grid replaced one of another size, lists count added items
+        if isinstance(after, GridStorage):
+            after = after.tile_types
+        if isinstance(after, np.ndarray):
+            if isinstance(before, np.ndarray) and before.shape == after.shape:
+                return int(np.count_nonzero(before != after))
+            return int(after.size)
+        if isinstance(after, list):
+            return len(after) - (before if isinstance(before, int) else 0)
+        return 0
+
+    def get_report(self) -> Dict:
+        return {
+            "stages": [report.to_dict() for report in self.reports],
+            "total_wall_time": sum([report.wall_time for report in self.reports])
+        }
+
+    def export_report(self, report_filename: str):
+        with open(report_filename, "w") as report_file:
+            report_file.write(json.dumps(self.get_report(), indent = 4))
@@ -1,56 +1,144 @@
 import pygame
-from level.tileset_loader import load_tileset
+import numpy as np
+from level.tileset_loader import load_tileset, TileType, TileSet
 from level.tile_type_enum import TileTypeEnum, DecoratorEnum
 from random import randrange
 from interface.mouse import Mouse
 from interface.keyboard import KeyBoard
-from level.grid_generator_helper import MazeGenerator
+from level.grid_generator_helper import MazeGenerator, Decoration
+from level.grid_storage import GridStorage
+from level.level import LevelData, load_level, save_level
 from registries.collision_registry import CollisionRegistry
-from typing import List
-from threading import Thread
+from registries.dirty_rect_registry import DirtyRectRegistry
+from level.terrain_chunk_cache import TerrainChunkCache
+from level.camera import Camera
+from level.spatial_bucket_grid import SpatialBucketGrid
+from typing import List, Tuple
+from time import perf_counter
 
 class Grid():
 
     current_tileset = None
 
-    def __init__(self, width: int, height: int, tileset_filename: str):
+    def __init__(self, width: int, height: int, tileset_filename: str, level_data: LevelData = None, incremental: bool = False, seed: int = None, tileset: TileSet = None):
 
-        if width % 4 != 0 or height % 4 != 0:
-            raise ValueError("grid dimensions must be multiple of four. provided: " + str(width) + " " + str(height))
-
-        self.x_pos = 0
-        self.y_pos = 0
-
-        Grid.current_tileset = load_tileset(tileset_filename)
+        if level_data is None and (width < 2 or height < 2):
+            raise ValueError("grid dimensions must be at least two. provided: " + str(width) + " " + str(height))
 
+        self.camera = Camera(0, 0, 20)
+        self.show_collision_overlay = True
+        self.previous_camera_state = None
         self.tileset_filename = tileset_filename
-        self.zoom_level = 20
-        
-        generator = MazeGenerator(width, height, Grid.current_tileset)
-        self.grid, collision_grid, self.decorations = generator.generate_grid()
-        self.width = self.grid["width"]
-        self.height = self.grid["height"]
+        # grids that are pieces of a larger world share its tileset rather than loading their own
+        self.tileset = tileset
+
+        self.longest_loading_step = 0
+        # an incremental grid is built a little at a time through continue_loading and only takes over once activate is called
+        self.loading_steps = self.build_in_steps(width, height, level_data, seed)
+        if not incremental:
+            for step in self.loading_steps:
+                pass
+            self.activate()
+
+    def build_in_steps(self, width: int, height: int, level_data: LevelData, seed: int):
+        if self.tileset is None:
+            self.tileset = load_tileset(self.tileset_filename)
+            yield
+
+        if level_data is None:
+            generator = MazeGenerator(width, height, self.tileset, seed = seed)
+            self.seed = generator.seed
+            yield from generator.generate_grid_in_steps()
+            self.storage, self.collision_grid, self.decorations = generator.grid, generator.collision_grid, generator.decorations
+            self.storage.set_tileset(self.tileset)
+        else:
+            self.seed = level_data.metadata.get("seed")
+            self.storage = GridStorage(level_data.width, level_data.height, self.tileset, tile_types = level_data.tile_types)
+            self.collision_grid = level_data.collision_grid
+            self.decorations = []
+            # decorations come in small batches so no single loading step runs much past a millisecond
+            for start in range(0, len(level_data.decorations), 128):
+                self.decorations.extend(level_data.create_decorations(self.tileset, start, start + 128))
+                yield
+        self.width = self.storage.width
+        self.height = self.storage.height
         self.grid_render = None
         self.decoration_render = None
-        Grid.current_tileset.update_renders(self.zoom_level)
-        
+        self.decoration_buckets = SpatialBucketGrid()
+        for start in range(0, len(self.decorations), 128):
+            for decoration in self.decorations[start:start + 128]:
+                self.decoration_buckets.insert(decoration.x_pos, decoration.y_pos, decoration)
+            yield
+
+        yield from self.update_connection_masks_in_steps()
+
+        # a tileset shared with the previous level already holds these scaled images, a new one scales them here
+        self.terrain_cache = TerrainChunkCache(self)
+        self.tileset.update_renders(self.camera.zoom_level)
+        yield
+
+        # chunks on screen are drawn ahead of time so the first frame of the level has nothing left to build
+        if self.camera.screen_width > 0 and self.camera.screen_height > 0:
+            yield from self.terrain_cache.build_visible_chunks_in_steps(self.camera)
+
+    def continue_loading(self, time_budget: float) -> bool:
+        # runs loading steps within time_budget seconds, returns True once the grid is fully built
+        # another step is only started while the longest one seen so far still fits, so the budget is overrun rarely rather than every frame
+        step_start = perf_counter()
+        end_time = step_start + time_budget
+        for step in self.loading_steps:
+            step_end = perf_counter()
+            self.longest_loading_step = max(self.longest_loading_step, step_end - step_start)
+            if step_end + self.longest_loading_step >= end_time:
+                return False
+            step_start = step_end
+        return True
+
+    def activate(self):
+        Grid.current_tileset = self.tileset
         collision = CollisionRegistry.get_instance()
-        collision.register_grid(collision_grid)
+        collision.register_grid(self.collision_grid)
         collision.register_decorators(self.decorations)
-        
+
+    @staticmethod
+    def load(level_filename: str) -> 'Grid':
+        level_data = load_level(level_filename)
+        return Grid(level_data.width, level_data.height, level_data.metadata["tileset_filename"], level_data)
+
+    def save(self, level_filename: str):
+        save_level(level_filename, self.get_level_data())
+
+    def get_level_data(self) -> LevelData:
+        return LevelData.from_generated(self.storage.tile_types, self.collision_grid, self.decorations, {"tileset_filename": self.tileset_filename, "seed": self.seed})
     
     def update(self, mouse: Mouse, delta: float):
-        Grid.current_tileset.update_animations(delta)
+        self.tileset.update_animations(delta)
 
         if KeyBoard.get_key_state(pygame.K_w).is_pressed:
-            self.y_pos = self.y_pos + 200 * delta
+            self.camera.move(0, 200 * delta)
         if KeyBoard.get_key_state(pygame.K_s).is_pressed:
-            self.y_pos = self.y_pos - 200 * delta
+            self.camera.move(0, -200 * delta)
 
         if KeyBoard.get_key_state(pygame.K_a).is_pressed:
-            self.x_pos = self.x_pos + 200 * delta
+            self.camera.move(200 * delta, 0)
         if KeyBoard.get_key_state(pygame.K_d).is_pressed:
-            self.x_pos = self.x_pos - 200 * delta
+            self.camera.move(-200 * delta, 0)
+
+        # the collision overlay starts shown so playtest builds keep it, c hides and shows it
+        if KeyBoard.get_key_state(pygame.K_c).is_pressed and KeyBoard.get_key_state(pygame.K_c).has_pressed_state_changed:
+            self.show_collision_overlay = not self.show_collision_overlay
+            DirtyRectRegistry.mark_full_redraw()
+
+        camera_state = (self.camera.x_pos, self.camera.y_pos, self.camera.zoom_level, self.camera.screen_width, self.camera.screen_height)
+        if camera_state != self.previous_camera_state:
+            DirtyRectRegistry.mark_full_redraw()
+            self.previous_camera_state = camera_state
+
+        self.update_terrain()
+
+    def update_terrain(self, build_missing: bool = True):
+        for changed_rect in self.terrain_cache.update(self.camera, build_missing):
+            DirtyRectRegistry.mark_dirty(changed_rect)
 
     
     def random_grid(self):
@@ -58,48 +146,92 @@ class Grid():
             for y in range(0, self.height):
                 random_number = randrange(0, 3)
                 if random_number == 0:
-                    self.grid[x][y] = Grid.current_tileset.get_tile_for_type(TileTypeEnum.PlainTile)
+                    self.storage.set_tile_type(x, y, TileTypeEnum.PlainTile)
                 elif random_number == 1:
-                    self.grid[x][y] = Grid.current_tileset.get_tile_for_type(TileTypeEnum.RedTile)
+                    self.storage.set_tile_type(x, y, TileTypeEnum.RedTile)
                 else:
-                    self.grid[x][y] = Grid.current_tileset.get_tile_for_type(TileTypeEnum.BlueTile)
+                    self.storage.set_tile_type(x, y, TileTypeEnum.BlueTile)
+        self.update_connection_masks()
+        self.terrain_cache.invalidate_all()
+        DirtyRectRegistry.mark_full_redraw()
 
     
+    def set_zoom_level(self, zoom_level: int):
+        if zoom_level < 1:
+            raise ValueError("zoom_level must be a whole number more than 0. provided: " + str(zoom_level))
+
+        self.camera.zoom_level = zoom_level
+        self.tileset.update_renders(zoom_level)
+
+    def set_tile(self, x: int, y: int, tile_type: TileTypeEnum):
+        self.storage.set_tile_type(x, y, tile_type)
+
+        for neighbour_x in range(x - 1, x + 2):
+            for neighbour_y in range(y - 1, y + 2):
+                if 0 <= neighbour_x < self.width and 0 <= neighbour_y < self.height:
+                    self.connection_masks[neighbour_x, neighbour_y] = self.get_connection_mask(neighbour_x, neighbour_y)
+                    self.terrain_cache.invalidate_cell(neighbour_x, neighbour_y)
+
+        screen_x, screen_y = self.camera.world_to_screen(x - 1, y - 1)
+        DirtyRectRegistry.mark_dirty((screen_x, screen_y, self.camera.zoom_level * 3, self.camera.zoom_level * 3))
+
+    def get_connection_mask(self, x: int, y: int) -> int:
+        connection_mask = 0
+        for bit, (x_offset, y_offset) in enumerate(TileType.connection_mask_offsets):
+            neighbour_x = x + x_offset
+            neighbour_y = y + y_offset
+            if neighbour_x < 0 or neighbour_x >= self.width or neighbour_y < 0 or neighbour_y >= self.height or\
+                 self.storage.get_tile(x, y).is_tile_type_allowed_for_connection(self.storage.get_tile_type(neighbour_x, neighbour_y)):
+                connection_mask = connection_mask | (1 << bit)
+        return connection_mask
+
+    def update_connection_masks(self):
+        for step in self.update_connection_masks_in_steps():
+            pass
+
+    def update_connection_masks_in_steps(self):
+        # yields after each of the eight neighbours, connection_masks is complete once it is exhausted
+        # the connection matrix shares the storage palette order, with one extra column for cells beyond the grid edge
+        connection_matrix = self.tileset.get_connection_matrix()
+        out_of_bounds_index = len(GridStorage.palette)
+
+        tile_indices = np.full((self.width + 2, self.height + 2), out_of_bounds_index, dtype=np.intp)
+        tile_indices[1:-1, 1:-1] = self.storage.tile_types
+
+        centre_indices = tile_indices[1:-1, 1:-1]
+        connection_masks = np.zeros((self.width, self.height), dtype=np.uint8)
+        for bit, (x_offset, y_offset) in enumerate(TileType.connection_mask_offsets):
+            neighbour_indices = tile_indices[1 + x_offset:self.width + 1 + x_offset, 1 + y_offset:self.height + 1 + y_offset]
+            connection_masks |= connection_matrix[centre_indices, neighbour_indices].astype(np.uint8) << bit
+            yield
+        self.connection_masks = connection_masks
+
     def render(self, screen):
-        
-        screen_width, screen_height = screen.get_size()
 
-        for x in range(0, self.width):
-            for y in range(0, self.height):
-                if (x + 1) * self.zoom_level - self.x_pos >= 0 and x * self.zoom_level - self.x_pos <= screen_width and\
-                     (y + 1) * self.zoom_level - self.y_pos >= 0 and y * self.zoom_level - self.y_pos <= screen_height:
-
-                    surroundings = [
-                        self.grid[x][y].is_tile_type_allowed_for_connection(self.grid[x-1][y-1].tile_type) if x - 1 >= 0 and y - 1 >= 0 else True,
-                        self.grid[x][y].is_tile_type_allowed_for_connection(self.grid[x][y-1].tile_type) if y - 1 >= 0 else True,
-                        self.grid[x][y].is_tile_type_allowed_for_connection(self.grid[x+1][y-1].tile_type) if x + 1 < self.grid["width"] and y - 1 >= 0 else True,
-                        self.grid[x][y].is_tile_type_allowed_for_connection(self.grid[x-1][y].tile_type) if x - 1 >= 0 else True,
-                        True,
-                        self.grid[x][y].is_tile_type_allowed_for_connection(self.grid[x+1][y].tile_type) if x + 1 < self.grid["width"] else True,
-                        self.grid[x][y].is_tile_type_allowed_for_connection(self.grid[x-1][y+1].tile_type) if x - 1 >= 0 and y + 1 < self.grid["height"]  else True,
-                        self.grid[x][y].is_tile_type_allowed_for_connection(self.grid[x][y+1].tile_type) if y + 1 < self.grid["height"] else True,
-                        self.grid[x][y].is_tile_type_allowed_for_connection(self.grid[x+1][y+1].tile_type) if x + 1 < self.grid["width"] and y + 1 < self.grid["height"] else True,
-                    ]
-
-                    self.grid[x][y].render(x * self.zoom_level - self.x_pos, y * self.zoom_level - self.y_pos, self.zoom_level, self.zoom_level, screen, surroundings)
-        
-        for decoration in self.decorations:
-            decoration.render(self.x_pos, self.y_pos, self.zoom_level, screen)
+        screen_width, screen_height = screen.get_size()
+        self.camera.set_screen_size(screen_width, screen_height)
 
-        collision = CollisionRegistry.get_instance()
-        collision.render(self.zoom_level, screen)
+        self.render_terrain(screen)
+        self.render_decorations(screen)
 
-        for decoration in self.decorations:
-            decoration.render(self.x_pos, self.y_pos, self.zoom_level, screen)
+        if self.show_collision_overlay:
+            collision = CollisionRegistry.get_instance()
+            collision.render(self.camera, screen)
 
-        collision = CollisionRegistry.get_instance()
-        collision.render(self.zoom_level, screen)
+    def render_terrain(self, screen, build_missing: bool = True):
+        self.terrain_cache.render(self.camera, screen, build_missing)
 
+    def render_decorations(self, screen):
+        # every visible decoration goes down in one Surface.blits call, in bucket order so overlapping trees stack the same way
+        screen.blits(self.get_decoration_blits(), doreturn=False)
 
+    def get_decoration_blits(self) -> List[Tuple]:
+        return [decoration.get_blit(self.camera.x_pos, self.camera.y_pos, self.camera.zoom_level) for decoration in self.get_visible_decorations()]
 
-    
\ No newline at end of file
+    def get_visible_decorations(self) -> List[Decoration]:
+        # decorations can overhang the tile they are placed on, so the search reaches past the screen edge by the largest decoration
+        margin = self.tileset.get_largest_decorator_tile_extent()
+        start_x, end_x, start_y, end_y = self.camera.get_visible_tile_range(self.width, self.height, margin)
+        if start_x == end_x or start_y == end_y:
+            return []
+        return self.decoration_buckets.query(start_x, end_x, start_y, end_y)
@@ -1,12 +1,21 @@
-from typing import Dict, List, Tuple
+import numpy as np
+from typing import Callable, Dict, List, Tuple
 from level.tileset_loader import TileTypeEnum, DecoratorEnum
 from level.tileset_loader import TileSet, DecoratorType
-from random import randrange, shuffle
+from random import Random, randrange
 from enum import Enum
-from itertools import combinations
-from uuid import uuid4
+from itertools import permutations
+from uuid import UUID, uuid4
 from registries.collision_registry import Collidable, CollisionObject
 from copy import copy
+from level.grid_storage import GridStorage
+from level.region_labels import RegionLabels
+from level.generation_pipeline import GenerationPipeline, GenerationStage
+
+# (x, y) offsets of the eight cells surrounding a cell
+neighbour_offsets = [(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+# (x, y) offsets of the four cells sharing an edge with a cell
+edge_offsets = [(-1, 0), (1, 0), (0, -1), (0, 1)]
 
 class DirectionEnum(Enum):
     UP = 1
@@ -14,10 +23,18 @@ class DirectionEnum(Enum):
     LEFT = 3
     RIGHT = 4
 
+# (x, y) step for each direction a maze path can take
+direction_offsets = {
+    DirectionEnum.UP: (0, -1),
+    DirectionEnum.DOWN: (0, 1),
+    DirectionEnum.LEFT: (-1, 0),
+    DirectionEnum.RIGHT: (1, 0)
+}
+
 class Decoration(Collidable):
 	
-	def __init__(self, x_pos: int, y_pos: int, type: DecoratorType, out_of_bounds: bool = False):
-		self.id = str(uuid4())
+	def __init__(self, x_pos: int, y_pos: int, type: DecoratorType, out_of_bounds: bool = False, id: str = None):
+		self.id = id if id is not None else str(uuid4())
 		self.x_pos = x_pos
 		self.y_pos = y_pos
 		self.type = type
@@ -46,6 +63,9 @@ class Decoration(Collidable):
 
 		self.type.render(self.x_pos * zoom_level - x_pos, self.y_pos * zoom_level - y_pos, zoom_level, surface)
 
+	def get_blit(self, x_pos: int, y_pos: int, zoom_level: int) -> Tuple:
+		return self.type.get_blit(self.x_pos * zoom_level - x_pos, self.y_pos * zoom_level - y_pos)
+
 	def get_collision_objects(self) -> CollisionObject:
 		collision_objects = self.type.get_collision_objects()
 		adjusted_collison_objects = []
@@ -58,307 +78,348 @@ class Decoration(Collidable):
 
 class GridRegion():
 
-	def __init__(self, tile_positions: List[Dict], tile_type: TileTypeEnum):
-		self.tile_positions = tile_positions
+	def __init__(self, region_labels: RegionLabels, label: int, tile_type: TileTypeEnum):
+		self.label = label
 		self.tile_type = tile_type
-		self.size = len(tile_positions)
-
+		self.size = region_labels.get_size(label)
+		self.touching_edge = region_labels.is_touching_edge(label)
+		self.min_x, self.min_y, self.max_x, self.max_y = region_labels.get_bounding_box(label)
+		# a view of the label array covering only this region's bounding box
+		self.label_view = region_labels.labels[self.min_x:self.max_x + 1, self.min_y:self.max_y + 1]
+
+	def get_bounding_box_slices(self) -> Tuple[slice, slice]:
+		return slice(self.min_x, self.max_x + 1), slice(self.min_y, self.max_y + 1)
+
+	def get_mask(self) -> np.ndarray:
+		# the mask covers the bounding box, not the whole grid
+		return self.label_view == self.label
+
+	def get_tile_positions(self) -> Tuple[np.ndarray, np.ndarray]:
+		x_positions, y_positions = np.nonzero(self.get_mask())
+		return x_positions + self.min_x, y_positions + self.min_y
+
+	@property
+	def tile_positions(self) -> List[Dict]:
+		x_positions, y_positions = self.get_tile_positions()
+		return [{"x": int(x), "y": int(y)} for x, y in zip(x_positions, y_positions)]
 	
-	def replace_tiles(self, grid: Dict, replacement_tile_type: TileTypeEnum):
-		for item in self.tile_positions:
-			grid[item["x"]][item["y"]] = GridGenerator.tileset.get_tile_for_type(replacement_tile_type)
-
-	def add_to_collision_grid(collision_grid: Dict):
-		for item in self.tile_positions:
-			collision_grid[item["x"]][item["y"]] = 1
-
-	def is_region_touching_edge(self, grid: Dict):
-		lowest_x = 0
-		lowest_y = 0
-		highest_x = grid["width"] - 1
-		highest_y = grid["height"] - 1
-
-		for item in self.tile_positions:
-			if item["x"] == lowest_x or item["x"] == highest_x:
-				return True
-			if item["y"] == lowest_y or item["y"] == highest_y:
-				return True
-		
-		return False
+	def replace_tiles(self, grid: GridStorage, replacement_tile_type: TileTypeEnum):
+		grid.tile_types[self.get_bounding_box_slices()][self.get_mask()] = GridStorage.get_index_for_tile_type(replacement_tile_type)
+
+	def add_to_collision_grid(self, collision_grid: np.ndarray):
+		collision_grid[self.get_bounding_box_slices()] |= self.get_mask()
+
+	def is_region_touching_edge(self, grid: GridStorage):
+		return self.touching_edge
 
 class GridGenerator():
 
-	def __init__(self, width: int, height: int, tileset: TileSet):
+	# bump whenever a change to generation means the same seed no longer produces the same level, cached levels are keyed on it
+	generator_version = 3
+
+	def __init__(self, width: int, height: int, tileset: TileSet, progress_callback: Callable[[float, str], None] = None, seed: int = None, track_allocations: bool = False):
 
 		GridGenerator.tileset = tileset
+		self.tileset = tileset
+		self.progress_callback = progress_callback
+		self.track_allocations = track_allocations
+		self.pipeline: GenerationPipeline = None
+		self.seed = seed if seed is not None else randrange(0, 2 ** 32)
 		self.decorations = []
 
-		self.grid = {}
-		self.grid['width'] = width
-		self.grid['height'] = height
-		for x in range(0, width):
-			self.grid[x] = {}
-			for y in range(0, height):
-				self.grid[x][y] = GridGenerator.tileset.get_tile_for_type(TileTypeEnum.BLANK)
-
-		self.collision_grid = {}
-		self.collision_grid['width'] = width
-		self.collision_grid['height'] = height
-		for x in range(0, width):
-			self.collision_grid[x] = {}
-			for y in range(0, height):
-				self.collision_grid[x][y] = 0
-
-	def generate_grid(self) -> Tuple[Dict, Dict, List[Decoration]]:
-		raise NotImplementedError("generate_grid must be implemented")
+		self.grid = GridStorage(width, height, tileset, TileTypeEnum.BLANK)
 
-	tileset = None
+		self.collision_grid = np.zeros((width, height), dtype=bool)
 
-class MazeGenerator(GridGenerator):
-	def __init__(self, width: int, height: int, tileset: TileSet):
+	def build_pipeline(self) -> GenerationPipeline:
+		raise NotImplementedError("build_pipeline must be implemented")
 
-		super().__init__(int(width/2), int(height/2), tileset)
+	def generate_grid(self) -> Tuple[GridStorage, np.ndarray, List[Decoration]]:
+		for step in self.generate_grid_in_steps():
+			pass
+		return self.grid, self.collision_grid, self.decorations
+
+	def generate_grid_in_steps(self):
+		# yields after every stage, grid, collision_grid and decorations hold the finished level once it is exhausted
+		GridGenerator.tileset = self.tileset
+		self.pipeline = self.build_pipeline()
+		state = {"grid": self.grid, "collision_grid": self.collision_grid, "decorations": self.decorations}
+		for step in self.pipeline.run_in_steps(state, self.progress_callback):
+			yield
+			# decorations look their types up on the shared tileset, which another generator may have swapped while this one was paused
+			GridGenerator.tileset = self.tileset
 
-	def generate_grid(self)-> Tuple[Dict, Dict, List[Decoration]]:
+		GridGenerator.tileset = None
 
-		line_grid_edge(self.grid, TileTypeEnum.BlueTile, 5)
-		generate_maze(self.grid, TileTypeEnum.BLANK, TileTypeEnum.STONE_TILES, 5)
-		replace_type(self.grid, TileTypeEnum.BlueTile, TileTypeEnum.BLANK)
-		bridge_gaps(self.grid, TileTypeEnum.BLANK, TileTypeEnum.STONE_TILES, TileTypeEnum.STONE_TILES, 5, 0.5)
-		trim_edges(self.grid, TileTypeEnum.STONE_TILES, TileTypeEnum.BLANK, 1, 50)
-		self.grid, self.collision_grid = scale_grid_up(self.grid, self.collision_grid, 2)
+		self.grid, self.collision_grid, self.decorations = state["grid"], state["collision_grid"], state["decorations"]
 
-		regions: List[Region] = get_grid_regions(self.grid, TileTypeEnum.BLANK)
-		regions_to_fill = get_regions_grid_percentage(self.grid, regions, 20, True)
+	def get_stage_random(self, stage: str) -> Random:
+		# every stage draws from its own generator derived from the level seed, so changing how much one stage draws leaves the others alone
+		return Random(str(self.seed) + ":" + stage)
+
+	tileset = None
+
+class MazeGenerator(GridGenerator):
+	def __init__(self, width: int, height: int, tileset: TileSet, progress_callback: Callable[[float, str], None] = None, seed: int = None, track_allocations: bool = False):
+
+		if width < 2 or height < 2:
+			raise ValueError("maze dimensions must be at least two. provided: " + str(width) + " " + str(height))
+
+		# the maze is carved at half size and scaled up, odd sizes round the half up and crop the spare row or column afterwards
+		self.width = width
+		self.height = height
+		super().__init__(int((width + 1) / 2), int((height + 1) / 2), tileset, progress_callback, seed, track_allocations)
+
+	def build_pipeline(self) -> GenerationPipeline:
+		return GenerationPipeline([
+			GenerationStage("carve maze", self.carve_maze, ["grid"], ["grid"]),
+			GenerationStage("bridge gaps", self.bridge_gaps, ["grid"], ["grid"]),
+			GenerationStage("trim edges", self.trim_edges, ["grid"], ["grid"]),
+			GenerationStage("scale up", self.scale_up, ["grid", "collision_grid"], ["grid", "collision_grid"]),
+			GenerationStage("fill regions", self.fill_regions, ["grid"], ["grid"]),
+			GenerationStage("build walls", self.build_walls, ["grid"], ["grid"]),
+			GenerationStage("find snow regions", self.find_snow_regions, ["grid"], ["exterior_snow_regions", "interior_snow_regions"]),
+			GenerationStage("decorate", self.decorate, ["exterior_snow_regions", "interior_snow_regions", "decorations"], ["decorations"]),
+			GenerationStage("build collision", self.build_collision, ["grid", "collision_grid"], ["collision_grid"])
+		], self.track_allocations)
+
+	def carve_maze(self, grid: GridStorage) -> GridStorage:
+		line_grid_edge(grid, TileTypeEnum.BlueTile, 5)
+		generate_maze(grid, TileTypeEnum.BLANK, TileTypeEnum.STONE_TILES, 5, self.get_stage_random("maze"))
+		replace_type(grid, TileTypeEnum.BlueTile, TileTypeEnum.BLANK)
+		return grid
+
+	def bridge_gaps(self, grid: GridStorage) -> GridStorage:
+		bridge_gaps(grid, TileTypeEnum.BLANK, TileTypeEnum.STONE_TILES, TileTypeEnum.STONE_TILES, 5, 0.5, self.get_stage_random("bridges"))
+		return grid
+
+	def trim_edges(self, grid: GridStorage):
+		yield from trim_edges_in_steps(grid, TileTypeEnum.STONE_TILES, TileTypeEnum.BLANK, 1, 50)
+		return grid
+
+	def scale_up(self, grid: GridStorage, collision_grid: np.ndarray) -> Tuple[GridStorage, np.ndarray]:
+		grid, collision_grid = scale_grid_up(grid, collision_grid, 2)
+		return crop_grid(grid, collision_grid, self.width, self.height)
+
+	def fill_regions(self, grid: GridStorage) -> GridStorage:
+		regions: List[GridRegion] = get_grid_regions(grid, TileTypeEnum.BLANK)
+		regions_to_fill = get_regions_grid_percentage(grid, regions, 20, True)
 
 		for item in regions_to_fill:
-			item.replace_tiles(self.grid, TileTypeEnum.NEON_TILE)
+			item.replace_tiles(grid, TileTypeEnum.NEON_TILE)
+		return grid
+
+	def build_walls(self, grid: GridStorage) -> GridStorage:
+		add_rim_to_tile_type(grid, TileTypeEnum.STONE_TILES, TileTypeEnum.WALL_TILE, TileTypeEnum.BLANK)
 
-		add_rim_to_tile_type(self.grid, TileTypeEnum.STONE_TILES, TileTypeEnum.WALL_TILE, TileTypeEnum.BLANK)
+		add_rim_to_tile_type(grid, TileTypeEnum.WALL_TILE, TileTypeEnum.STONE_FLOOR, TileTypeEnum.BLANK)
+		add_rim_to_tile_type(grid, TileTypeEnum.STONE_FLOOR, TileTypeEnum.STONE_FLOOR, TileTypeEnum.BLANK)
+		add_rim_to_tile_type(grid, TileTypeEnum.STONE_FLOOR, TileTypeEnum.STONE_FLOOR, TileTypeEnum.BLANK)
 
-		add_rim_to_tile_type(self.grid, TileTypeEnum.WALL_TILE, TileTypeEnum.STONE_FLOOR, TileTypeEnum.BLANK)
-		add_rim_to_tile_type(self.grid, TileTypeEnum.STONE_FLOOR, TileTypeEnum.STONE_FLOOR, TileTypeEnum.BLANK)
-		add_rim_to_tile_type(self.grid, TileTypeEnum.STONE_FLOOR, TileTypeEnum.STONE_FLOOR, TileTypeEnum.BLANK)
+		replace_type(grid, TileTypeEnum.BLANK, TileTypeEnum.SNOW_FLOOR)
+		return grid
 
-		replace_type(self.grid, TileTypeEnum.BLANK, TileTypeEnum.SNOW_FLOOR)
+	def find_snow_regions(self, grid: GridStorage) -> Tuple[List[GridRegion], List[GridRegion]]:
+		snow_regions = get_grid_regions(grid, TileTypeEnum.SNOW_FLOOR)
+		return split_by_exterior_and_interior_regions(grid, snow_regions)
 
-		snow_regions = get_grid_regions(self.grid, TileTypeEnum.SNOW_FLOOR)
-		exterior_snow_regions, interior_snow_regions = split_by_exterior_and_interior_regions(self.grid, snow_regions)
+	def decorate(self, exterior_snow_regions: List[GridRegion], interior_snow_regions: List[GridRegion], decorations: List[Decoration]):
+		# the longest stage, so it hands control back every few hundred placements when generation is spread over frames
+		decoration_random = self.get_stage_random("decorations")
 		for snow_region in exterior_snow_regions:
-			self.decorations.extend(
-				decorate_region_with_decoration_at_sparsity_percentage(snow_region, DecoratorEnum.TREE, 25, True, False)
+			decorations.extend(
+				(yield from decorate_region_in_steps(snow_region, DecoratorEnum.TREE, 25, True, False, random_generator = decoration_random))
 			)
 
 		for snow_region in interior_snow_regions:
-			self.decorations.extend(
-				decorate_region_with_decoration_at_sparsity_percentage(snow_region, DecoratorEnum.TREE, 5, True, False)
+			decorations.extend(
+				(yield from decorate_region_in_steps(snow_region, DecoratorEnum.TREE, 5, True, False, random_generator = decoration_random))
 			)
+		return decorations
 
-		GridGenerator.tileset = None
+	def build_collision(self, grid: GridStorage, collision_grid: np.ndarray) -> np.ndarray:
+		add_tile_types_to_collision_grid(grid, collision_grid, [TileTypeEnum.WALL_TILE, TileTypeEnum.STONE_FLOOR])
+		return collision_grid
 
-		add_tile_types_to_collision_grid(self.grid, self.collision_grid, [TileTypeEnum.WALL_TILE, TileTypeEnum.STONE_FLOOR])
 
-		return self.grid, self.collision_grid, self.decorations
+def add_tile_types_to_collision_grid(grid: GridStorage, collision_grid: np.ndarray, tile_types: List[TileTypeEnum]):
+	for tile_type in tile_types:
+		collision_grid |= grid.get_tile_type_mask(tile_type)
 
 
-def add_tile_types_to_collision_grid(grid: Dict, collision_grid: Dict, tile_types: List[TileTypeEnum]):
-	for x in range(grid["width"]):
-		for y in range(grid["height"]):
-			if grid[x][y].tile_type in tile_types:
-				collision_grid[x][y] = 1
+def decorate_region_with_decoration_at_sparsity_percentage(region: GridRegion, decoration_type: DecoratorEnum, sparsity_percentage: float, out_of_counds_decorations: bool = False, leave_space: bool = False, minimum_distance: float = 0, random_generator: Random = None) -> List[Decoration]:
+	placement_steps = decorate_region_in_steps(region, decoration_type, sparsity_percentage, out_of_counds_decorations, leave_space, minimum_distance, random_generator)
+	while True:
+		try:
+			next(placement_steps)
+		except StopIteration as finished:
+			return finished.value
 
 
-def decorate_region_with_decoration_at_sparsity_percentage(region: GridRegion, decoration_type: DecoratorEnum, sparsity_percentage: float, out_of_counds_decorations: bool = False, leave_space: bool = False) -> List[Decoration]:
+def decorate_region_in_steps(region: GridRegion, decoration_type: DecoratorEnum, sparsity_percentage: float, out_of_counds_decorations: bool = False, leave_space: bool = False, minimum_distance: float = 0, random_generator: Random = None, draws_per_step: int = 256):
+	# yields after every draws_per_step positions drawn and returns the placed decorations once it is done
 	if sparsity_percentage < 0 or sparsity_percentage > 100:
 		raise ValueError("sparsity_percentage must be between 0 and 100. provided: " + str(sparsity_percentage))
 
+	if random_generator is None:
+		random_generator = Random(randrange(0, 2 ** 32))
+
 	decorations: List[Decoration] = []
-	potential_placements = region.tile_positions
-
-	size_goal = len(region.tile_positions) * sparsity_percentage / 100
-	decoration_completed = False
-	while decoration_completed is False:
-		positions_to_remove = []
-
-		for tile_position in potential_placements:
-			chance = randrange(0, 100000) / 1000
-			if chance <= 0.5:
-				can_place = True
-				if leave_space == True:
-					for decoration in decorations:
-						if decoration.is_adjacent_to_position(tile_position["x"], tile_position["y"]):
-							can_place = False
-							break
-				if can_place:
-					decorations.append(
-						Decoration(
-							tile_position["x"],
-							tile_position["y"],
-							GridGenerator.tileset.get_decorator_for_type(decoration_type),
-							out_of_counds_decorations
-						)
-					)
-				positions_to_remove.append(tile_position)
-
-		for position_to_remove in positions_to_remove:
-			potential_placements.remove(position_to_remove)
-
-		if len(potential_placements) == 0 or len(decorations) > size_goal:
-			decoration_completed = True
+	decorator = GridGenerator.tileset.get_decorator_for_type(decoration_type)
+
+	x_positions, y_positions = region.get_tile_positions()
+	position_count = len(x_positions)
+	# placement stops once the count passes the sparsity goal
+	placement_goal = min(int(position_count * sparsity_percentage / 100) + 1, position_count)
+
+	spacing_x_offsets, spacing_y_offsets = get_spacing_offsets(leave_space, minimum_distance)
+	spacing_reach = int(np.abs(spacing_x_offsets).max()) if len(spacing_x_offsets) > 0 else 0
+	# placed decorations over the region's bounding box, padded so spacing checks never leave the array
+	occupied = np.zeros((region.max_x - region.min_x + 1 + 2 * spacing_reach, region.max_y - region.min_y + 1 + 2 * spacing_reach), dtype=bool)
+
+	# positions are drawn without replacement by a Fisher-Yates shuffle that only records the swaps it has made
+	swapped_indices = {}
+	for drawn_count in range(0, position_count):
+		if len(decorations) >= placement_goal:
+			break
+		if drawn_count > 0 and drawn_count % draws_per_step == 0:
+			yield
+
+		picked = random_generator.randrange(drawn_count, position_count)
+		index = swapped_indices.get(picked, picked)
+		swapped_indices[picked] = swapped_indices.get(drawn_count, drawn_count)
+
+		x_pos = int(x_positions[index])
+		y_pos = int(y_positions[index])
+		occupied_x = x_pos - region.min_x + spacing_reach
+		occupied_y = y_pos - region.min_y + spacing_reach
+
+		if spacing_reach > 0 and occupied[occupied_x + spacing_x_offsets, occupied_y + spacing_y_offsets].any():
+			continue
+
+		occupied[occupied_x, occupied_y] = True
+		decorations.append(
+			Decoration(
+				x_pos,
+				y_pos,
+				decorator,
+				out_of_counds_decorations,
+				str(UUID(int = random_generator.getrandbits(128), version = 4))
+			)
+		)
 
 	return decorations
 
 
-def add_rim_to_tile_type(grid: Dict, tile_type_to_rim: TileTypeEnum, rim_tile_type: TileTypeEnum, tile_type_to_replace: TileTypeEnum):
-	tiles_to_rim = []
-
-	for x in range(0, grid["width"]):
-		for y in range(0, grid["height"]):
-			if grid[x][y].tile_type == tile_type_to_rim:
-
-				if x - 1 >= 0:
-					if tile_type_to_replace is None or grid[x - 1][y].tile_type == tile_type_to_replace:
-						tiles_to_rim.append({"x": x - 1, "y": y})
+def get_spacing_offsets(leave_space: bool, minimum_distance: float) -> Tuple[np.ndarray, np.ndarray]:
+	# offsets of the cells that must be free of decorations before one can be placed
+	reach = max(1 if leave_space else 0, int(np.ceil(minimum_distance)))
+	x_offsets, y_offsets = np.meshgrid(np.arange(-reach, reach + 1), np.arange(-reach, reach + 1), indexing="ij")
+	within_spacing = np.hypot(x_offsets, y_offsets) < minimum_distance
+	if leave_space:
+		within_spacing |= (np.abs(x_offsets) <= 1) & (np.abs(y_offsets) <= 1)
+	within_spacing &= (x_offsets != 0) | (y_offsets != 0)
+	return x_offsets[within_spacing], y_offsets[within_spacing]
 
-				if x - 1 >= 0 and y - 1 >= 0:
-					if tile_type_to_replace is None or grid[x - 1][y - 1].tile_type == tile_type_to_replace:
-						tiles_to_rim.append({"x": x - 1, "y": y - 1})
 
-				if y - 1 >= 0:
-					if tile_type_to_replace is None or grid[x][y - 1].tile_type == tile_type_to_replace:
-						tiles_to_rim.append({"x": x, "y": y - 1})
+def add_rim_to_tile_type(grid: GridStorage, tile_type_to_rim: TileTypeEnum, rim_tile_type: TileTypeEnum, tile_type_to_replace: TileTypeEnum):
+	# a cell is rimmed when any of its eight neighbours is of tile_type_to_rim, so the rim is the 3x3 dilation of that type
+	padded_rim_source = np.pad(grid.get_tile_type_mask(tile_type_to_rim), 1)
+	tiles_to_rim = np.zeros((grid.width, grid.height), dtype=bool)
+	for x_offset, y_offset in neighbour_offsets:
+		tiles_to_rim |= padded_rim_source[1 + x_offset:grid.width + 1 + x_offset, 1 + y_offset:grid.height + 1 + y_offset]
 
-				if x + 1 < grid["width"]:
-					if tile_type_to_replace is None or grid[x + 1][y].tile_type == tile_type_to_replace:
-						tiles_to_rim.append({"x": x + 1, "y": y})
+	if tile_type_to_replace is not None:
+		tiles_to_rim &= grid.get_tile_type_mask(tile_type_to_replace)
 
-				if x + 1 < grid["width"] and y + 1 < grid["height"]:
-					if tile_type_to_replace is None or grid[x + 1][y + 1].tile_type == tile_type_to_replace:
-						tiles_to_rim.append({"x": x + 1, "y": y + 1})
+	grid.set_tile_type_for_mask(tiles_to_rim, rim_tile_type)
 
-				if y + 1 < grid["height"]:
-					if tile_type_to_replace is None or grid[x][y + 1].tile_type == tile_type_to_replace:
-						tiles_to_rim.append({"x": x, "y": y + 1})
 
-				if x + 1 < grid["width"] and y - 1 >= 0:
-					if tile_type_to_replace is None or grid[x + 1][y - 1].tile_type == tile_type_to_replace:
-						tiles_to_rim.append({"x": x + 1, "y": y - 1})
+def get_grid_regions(grid: GridStorage, tile_type: TileTypeEnum) -> List[GridRegion]:
+	region_labels = RegionLabels(grid.get_tile_type_mask(tile_type))
 
-				if x - 1 >= 0 and y + 1 < grid["height"]:
-					if tile_type_to_replace is None or grid[x - 1][y + 1].tile_type == tile_type_to_replace:
-						tiles_to_rim.append({"x": x - 1, "y": y + 1})
-
-	for tile in tiles_to_rim:
-		grid[tile["x"]][tile["y"]] = GridGenerator.tileset.get_tile_for_type(rim_tile_type)
-
-
-def get_grid_regions(grid: Dict, tile_type: TileTypeEnum) -> List[GridRegion]:
-
-	flood_data = {}
-	for x in range(0, grid["width"]):
-		flood_data[x] = {}
-		for y in range(0, grid["height"]):
-			flood_data[x][y] = {}
-
-	region_data = {}
-
-	region_identification_complete = False
-	region_count = 0
-
-	for x in range(0, grid["width"]):
-		for y in range(0, grid["height"]):
-			if grid[x][y].tile_type == tile_type:
-				if "id" not in flood_data[x][y].keys():
-					region_count = region_count + 1
-					flood_data[x][y]["id"] = region_count
-
-					region_data[region_count] = [{"x": x, "y": y}]
-					flooding_queue = [{"x": x, "y": y}]
-
-					count = 0
-					while count < len(flooding_queue):
-						check_x = flooding_queue[count]["x"]
-						check_y = flooding_queue[count]["y"]
-
-						if check_x - 1 >= 0:
-							if grid[check_x - 1][check_y].tile_type == tile_type and "id" not in flood_data[check_x - 1][check_y].keys():
-								flooding_queue.append({"x": check_x - 1, "y": check_y})
-								region_data[region_count].append({"x": check_x - 1, "y": check_y})
-								flood_data[check_x - 1][check_y]["id"] = region_count
-
-						if check_x + 1 < grid["width"]:
-							if grid[check_x + 1][check_y].tile_type == tile_type and "id" not in flood_data[check_x + 1][check_y].keys():
-								flooding_queue.append({"x": check_x + 1, "y": check_y})
-								region_data[region_count].append({"x": check_x + 1, "y": check_y})
-								flood_data[check_x + 1][check_y]["id"] = region_count
-
-						if check_y - 1 >= 0:
-							if grid[check_x][check_y - 1].tile_type == tile_type and "id" not in flood_data[check_x][check_y - 1].keys():
-								flooding_queue.append({"x": check_x, "y": check_y - 1})
-								region_data[region_count].append({"x": check_x, "y": check_y - 1})
-								flood_data[check_x][check_y - 1]["id"] = region_count
-
-						if check_y + 1 < grid["height"]:
-							if grid[check_x][check_y + 1].tile_type == tile_type and "id" not in flood_data[check_x][check_y + 1].keys():
-								flooding_queue.append({"x": check_x, "y": check_y + 1})
-								region_data[region_count].append({"x": check_x, "y": check_y + 1})
-								flood_data[check_x][check_y + 1]["id"] = region_count
-
-						count = count + 1
-						
 	regions = []
-
-	for value in region_data.values():
+	for label in range(1, region_labels.region_count + 1):
 		regions.append(
-			GridRegion(value, tile_type)
+			GridRegion(region_labels, label, tile_type)
 		)
 
 	return regions
 
 
-def get_regions_grid_percentage(grid: Dict, regions: List[GridRegion], percentage_of_grid: int, exclude_edge_regions: bool = False) -> List[GridRegion]:
+def get_regions_grid_percentage(grid: GridStorage, regions: List[GridRegion], percentage_of_grid: int, exclude_edge_regions: bool = False, minimum_region_count: int = 2, maximum_region_count: int = 5, sum_bucket_count: int = 65536) -> List[GridRegion]:
 	ordered_regions = order_regions_by_size_descending(grid, regions, exclude_edge_regions)
 
 	if percentage_of_grid < 0 or percentage_of_grid > 100:
 		raise ValueError("percentage_of_grid must be between 0 and 100. provided: " + str(percentage_of_grid))
 
-	size_goal = int((grid["width"] * grid["height"]) * percentage_of_grid / 100)
-
-	size_list = []
-	for region in ordered_regions:
-		size_list.append(region.size)
-
-	closest = []
-	closet_size_combo = None
-	pefect_match_found = False
-	max_depth = len(ordered_regions) + 1
-	if max_depth > 6:
-		max_depth = 6
-	for depth in range(2,max_depth):
-		if pefect_match_found == False:
-			for i in combinations(size_list, depth):
-				if sum(i) == size_goal:
-					pefect_match_found = True
-					closet_size_combo = i
-				else:
-					closest.append((abs(sum(i) - size_goal), i))
-	if closet_size_combo is None:
-		closet_size_combo = min(closest)[1]
-
-	identified_regions = []
-	for size in closet_size_combo:
-		found = False
-		for region in ordered_regions:
-			if found == False:
-				if region.size == size:
-					identified_regions.append(region)
-					found = True
-					break
-
-	return identified_regions
-
-
-def order_regions_by_size_descending(grid: Dict, regions: List[GridRegion], exclude_edge_regions: bool = False) -> List[GridRegion]:
+	size_goal = int((grid.width * grid.height) * percentage_of_grid / 100)
+
+	sizes = np.array([region.size for region in ordered_regions], dtype=np.int64)
+	chosen_indices = find_closest_subset_sum(sizes, size_goal, minimum_region_count, maximum_region_count, sum_bucket_count)
+
+	return [ordered_regions[index] for index in chosen_indices]
+
+
+def find_closest_subset_sum(sizes: np.ndarray, size_goal: int, minimum_count: int, maximum_count: int, sum_bucket_count: int) -> List[int]:
+	# returns the indices of between minimum_count and maximum_count sizes whose sum is closest to size_goal, preferring fewer sizes on a tie
+	if minimum_count < 1 or maximum_count < minimum_count:
+		raise ValueError("region counts must satisfy 1 <= minimum_count <= maximum_count. provided: " + str(minimum_count) + " " + str(maximum_count))
+	if sum_bucket_count < 1:
+		raise ValueError("sum_bucket_count must be a whole number more than 0. provided: " + str(sum_bucket_count))
+
+	maximum_count = min(maximum_count, len(sizes))
+	minimum_count = min(minimum_count, maximum_count)
+	if maximum_count == 0:
+		return []
+
+	# sums past twice the goal can only win when even the smallest allowed selection is that large
+	smallest_sum = int(np.sort(sizes)[:minimum_count].sum())
+	largest_useful_sum = max(2 * size_goal, smallest_sum)
+
+	# the search table holds a cell per count and sum, sums are measured in units coarse enough to fit sum_bucket_count columns so its size does not grow with the grid
+	unit = max(1, -(-(largest_useful_sum + 1) // sum_bucket_count))
+	unit_sizes = np.maximum((sizes + unit // 2) // unit, 1)
+	unit_goal = (size_goal + unit // 2) // unit
+	sum_limit = (largest_useful_sum + unit - 1) // unit
+
+	reachable = np.zeros((maximum_count + 1, sum_limit + 1), dtype=bool)
+	reachable[0, 0] = True
+	# the size index that first reached each count and sum, the remaining sizes are found by walking back through it
+	last_added = np.full((maximum_count + 1, sum_limit + 1), -1, dtype=np.int32)
+
+	for index, unit_size in enumerate(unit_sizes):
+		if unit_size > sum_limit:
+			continue
+		for count in range(min(maximum_count, index + 1), 0, -1):
+			newly_reachable = reachable[count - 1, :sum_limit + 1 - unit_size] & ~reachable[count, unit_size:]
+			reachable[count, unit_size:] |= newly_reachable
+			last_added[count, unit_size:][newly_reachable] = index
+
+	best = None
+	for count in range(minimum_count, maximum_count + 1):
+		reachable_sums = np.flatnonzero(reachable[count])
+		if len(reachable_sums) == 0:
+			continue
+		closest_sum = reachable_sums[np.argmin(np.abs(reachable_sums - unit_goal))]
+		if best is None or abs(closest_sum - unit_goal) < abs(best[1] - unit_goal):
+			best = (count, closest_sum)
+
+	if best is None:
+		return []
+
+	chosen_indices = []
+	count, current_sum = best
+	while count > 0:
+		index = int(last_added[count, current_sum])
+		chosen_indices.append(index)
+		current_sum = current_sum - unit_sizes[index]
+		count = count - 1
+
+	return sorted(chosen_indices)
+
+
+def order_regions_by_size_descending(grid: GridStorage, regions: List[GridRegion], exclude_edge_regions: bool = False) -> List[GridRegion]:
 	if not exclude_edge_regions:
 		applicable_regions = regions
 	else:
@@ -367,31 +428,10 @@ def order_regions_by_size_descending(grid: Dict, regions: List[GridRegion], excl
 			if not region.is_region_touching_edge(grid):
 				applicable_regions.append(region)
 
-	ordered_regions = []
-
-	is_ordered = False
-	while is_ordered is False:
-
-		if len(applicable_regions) > 0:
-			largest_region = None 
-
-			for region in applicable_regions:
-				if largest_region is None:
-					largest_region = region
-				else:
-					if region.size > largest_region.size:
-						largest_region = region
-
-			ordered_regions.append(largest_region)
-
-			applicable_regions.remove(largest_region)
-		else:
-			is_ordered = True
-	
-	return ordered_regions	
+	return sorted(applicable_regions, key=lambda region: region.size, reverse=True)
 
 
-def split_by_exterior_and_interior_regions(grid: Dict, regions: List[GridRegion]) -> Tuple[List[GridRegion], List[GridRegion]]:
+def split_by_exterior_and_interior_regions(grid: GridStorage, regions: List[GridRegion]) -> Tuple[List[GridRegion], List[GridRegion]]:
 	exterior_reions = []
 	interior_regions = []
 
@@ -404,278 +444,235 @@ def split_by_exterior_and_interior_regions(grid: Dict, regions: List[GridRegion]
 	return exterior_reions, interior_regions
 
 
-def line_grid_edge(grid: Dict, new_tile_type: TileTypeEnum, thickness: int):
-		for x in range(0, grid['width']):
-			for y in range(0, grid['height']):
-				if x < thickness or grid['width'] - x <= thickness or y < thickness or grid['height'] - y <= thickness:
-					grid[x][y] = GridGenerator.tileset.get_tile_for_type(new_tile_type)
+def line_grid_edge(grid: GridStorage, new_tile_type: TileTypeEnum, thickness: int):
+	x = np.arange(0, grid.width)[:, np.newaxis]
+	y = np.arange(0, grid.height)[np.newaxis, :]
+	edge_mask = (x < thickness) | (grid.width - x <= thickness) | (y < thickness) | (grid.height - y <= thickness)
+	grid.set_tile_type_for_mask(edge_mask, new_tile_type)
 
 
-def replace_type(grid: Dict, old_tile_type: TileTypeEnum, new_tile_type: TileTypeEnum):
-	for x in range(0, grid['width']):
-		for y in range(0, grid['height']):
-			if grid[x][y].tile_type == old_tile_type:
-				grid[x][y] = GridGenerator.tileset.get_tile_for_type(new_tile_type)
+def replace_type(grid: GridStorage, old_tile_type: TileTypeEnum, new_tile_type: TileTypeEnum):
+	grid.set_tile_type_for_mask(grid.get_tile_type_mask(old_tile_type), new_tile_type)
 
 
-def scale_grid_up(grid: Dict, collision_grid: Dict, scale_multiple: int):
+def scale_grid_up(grid: GridStorage, collision_grid: np.ndarray, scale_multiple: int):
 	if scale_multiple < 1:
 		raise ValueError("scale_multiple must be a whole number more than 1. Provided: " + str(scale_multiple))
 
-	new_grid = {}
-	new_grid["width"] = grid["width"] * scale_multiple
-	new_grid["height"] = grid["height"] * scale_multiple
-	for x in range(0, grid["width"] * scale_multiple):
-		new_grid[x] = {}
-		for y in range(0, grid["height"] * scale_multiple):
-			new_grid[x][y] = grid[int(x/scale_multiple)][int(y/scale_multiple)]
-
-	new_collision_grid = {}
-	new_collision_grid["width"] = grid["width"] * scale_multiple
-	new_collision_grid["height"] = grid["height"] * scale_multiple
-	for x in range(0, collision_grid["width"] * scale_multiple):
-		new_collision_grid[x] = {}
-		for y in range(0, collision_grid["height"] * scale_multiple):
-			new_collision_grid[x][y] = collision_grid[int(x/scale_multiple)][int(y/scale_multiple)]
+	new_grid = GridStorage(grid.width * scale_multiple, grid.height * scale_multiple, grid.tileset,
+		tile_types = grid.tile_types.repeat(scale_multiple, axis=0).repeat(scale_multiple, axis=1))
+	new_collision_grid = collision_grid.repeat(scale_multiple, axis=0).repeat(scale_multiple, axis=1)
 
 	return new_grid, new_collision_grid
 
 
-def trim_edges(grid: Dict, edge_tile_type: TileTypeEnum, replacement_tile_type: TileTypeEnum, minimum_edges: int, pass_through_count: int):
-
-	for i in range(0, pass_through_count):
-
-		edges_found = []
-
-		for x in range(0, grid['width']):
-			for y in range(0, grid['height']):
-				edge_count = 0
-
-				if not x - 1 < 0:
-					if grid[x - 1][y].tile_type == edge_tile_type:
-						edge_count = edge_count + 1
-
-				if not x + 1 > grid["width"] - 1:
-					if grid[x + 1][y].tile_type == edge_tile_type:
-						edge_count = edge_count + 1
-
-				if not y - 1 < 0:
-					if grid[x][y - 1].tile_type == edge_tile_type:
-						edge_count = edge_count + 1
-
-				if not y + 1 > grid["height"] - 1:
-					if grid[x][y + 1].tile_type == edge_tile_type:
-						edge_count = edge_count + 1
-
-				if edge_count <= minimum_edges:
-					edges_found.append({"x": x, "y": y})
-		
-		for edge_found in edges_found:
-			grid[edge_found["x"]][edge_found["y"]] = GridGenerator.tileset.get_tile_for_type(replacement_tile_type)
-
-
-def bridge_gaps(grid: Dict, gap_tile_type: TileTypeEnum, edge_tile_type: TileTypeEnum, bridge_tile_type: TileTypeEnum, max_bridge_length: int, fill_chance: float):
-	bridges_found = []
-
-	for x in range(0, grid["width"]):
-		for y in range(0, grid["height"]):
-			if grid[x][y].tile_type == gap_tile_type:
-
-				invalid_horizontal_edge = False
-				invalid_vertical_edge = False
-
-				horizontal_bridge = [{"x": x, "y": y}]
-				vertical_bridge = [{"x": x, "y": y}]
-
-				right_horizontal_edge_found = False
-				left_horizontal_edge_found = False
-
-				top_vertical_edge_found = False
-				bottom_vertical_edge_found = False
-				if x - max_bridge_length > 0 and x + max_bridge_length < grid["width"] - 1 and y > 1 and y < grid["height"] - 1:
-					for i in range(1, max_bridge_length + 2):
-						if grid[x + i][y].tile_type == gap_tile_type:
-							if not right_horizontal_edge_found:
-								horizontal_bridge.append({"x": x + i, "y": y})
-						if grid[x - i][y].tile_type == gap_tile_type:
-							if not left_horizontal_edge_found:
-								horizontal_bridge.append({"x": x - i, "y": y})
-						
-						if grid[x + i][y].tile_type == edge_tile_type:
-							right_horizontal_edge_found = True
-						if grid[x - i][y].tile_type == edge_tile_type:
-							left_horizontal_edge_found = True
-
-
-						if grid[x + i][y].tile_type != gap_tile_type and grid[x + i][y].tile_type != edge_tile_type:
-							if not right_horizontal_edge_found:
-								invalid_horizontal_edge = True
-						if grid[x + i][y + 1].tile_type != gap_tile_type:
-							if not right_horizontal_edge_found:
-								invalid_horizontal_edge = True
-						if grid[x + i][y - 1].tile_type != gap_tile_type:
-							if not right_horizontal_edge_found:
-								invalid_horizontal_edge = True
-						if grid[x - i][y].tile_type != gap_tile_type and grid[x - i][y].tile_type != edge_tile_type:
-							if not left_horizontal_edge_found:
-								invalid_horizontal_edge = True
-						if grid[x - i][y + 1].tile_type != gap_tile_type:
-							if not left_horizontal_edge_found:
-								invalid_horizontal_edge = True
-						if grid[x - i][y - 1].tile_type != gap_tile_type:
-							if not left_horizontal_edge_found:
-								invalid_horizontal_edge = True
-				else:
-					invalid_horizontal_edge = True
-
-				if y - max_bridge_length > 0 and y + max_bridge_length < grid["height"] - 1 and x > 1 and x < grid["width"] - 1:
-					for i in range(1, max_bridge_length + 2):
-						if grid[x][y + i].tile_type == gap_tile_type:
-							if not bottom_vertical_edge_found:
-								vertical_bridge.append({"x": x, "y": y + i})
-						if grid[x][y - i].tile_type == gap_tile_type:
-							if not top_vertical_edge_found:
-								vertical_bridge.append({"x": x, "y": y - i})
-
-						if grid[x][y + i].tile_type == edge_tile_type:
-							bottom_vertical_edge_found = True
-						if grid[x][y - i].tile_type == edge_tile_type:
-							top_vertical_edge_found = True
-
-						if grid[x][y + i].tile_type != gap_tile_type and grid[x][y + i].tile_type != edge_tile_type:
-							if not bottom_vertical_edge_found:
-								invalid_vertical_edge = True
-						if grid[x + 1][y + i].tile_type != gap_tile_type:
-							if not bottom_vertical_edge_found:
-								invalid_vertical_edge = True
-						if grid[x - 1][y + i].tile_type != gap_tile_type:
-							if not bottom_vertical_edge_found:
-								invalid_vertical_edge = True
-						if grid[x][y - i].tile_type != gap_tile_type and grid[x][y - i].tile_type != edge_tile_type:
-							if not top_vertical_edge_found:
-								invalid_vertical_edge = True
-						if grid[x + 1][y - i].tile_type != gap_tile_type:
-							if not top_vertical_edge_found:
-								invalid_vertical_edge = True
-						if grid[x - 1][y - i].tile_type != gap_tile_type:
-							if not top_vertical_edge_found:
-								invalid_vertical_edge = True
-				else:
-					invalid_vertical_edge = True
-				
-				valid_horizontal = len(horizontal_bridge) <= max_bridge_length and not invalid_horizontal_edge and left_horizontal_edge_found and right_horizontal_edge_found
-				valid_vertical = len(vertical_bridge) <= max_bridge_length and not invalid_vertical_edge
-
-				if not valid_horizontal and not valid_vertical:
-					continue
-
-				bridge_options = []
-				if valid_horizontal:
-					bridge_options.append(horizontal_bridge)
-				if valid_vertical:
-					bridge_options.append(vertical_bridge)
-
-				bridge_choice = randrange(0, len(bridge_options))
-				bridges_found.append(bridge_options[bridge_choice])
-	
-	for bridge in bridges_found:
-		chance = randrange(0, 100000)/ 1000
-		if chance <= fill_chance:
-			for bridge_position in bridge:
-				grid[bridge_position["x"]][bridge_position["y"]] = GridGenerator.tileset.get_tile_for_type(bridge_tile_type)
-				
-
-def generate_maze(grid: Dict, base_tile_type: TileTypeEnum, new_tile_type: TileTypeEnum, maze_path_distance: int):
-
-	starting_x = None
-	starting_y = None
-
-	start_location_select = False
-
-	parent_grid = {}
-	for x in range(grid['width']):
-		parent_grid[x] = {}
-		for y in range(grid['height']):
-			parent_grid[x][y] = {"x": None, "y": None}
-
-	while start_location_select is False:
-
-		starting_x = randrange(1, grid['width'])
-		starting_y = randrange(1, grid['height'])
-
-		if grid[starting_x][starting_y].tile_type == base_tile_type:
-			start_location_select = True
-			grid[starting_x][starting_y] = GridGenerator.tileset.get_tile_for_type(new_tile_type)
-			parent_grid[starting_x][starting_y] = {"x": None, "y": None}
-
-	current_x, current_y = build_path_from_position(grid, parent_grid, starting_x, starting_y, base_tile_type, new_tile_type, maze_path_distance)
-
-	maze_done = False
-	while maze_done is False:
-		current_x, current_y = build_path_from_position(grid, parent_grid, current_x, current_y, base_tile_type, new_tile_type, maze_path_distance)
-		current_parents = parent_grid[current_x][current_y]
-		current_x = current_parents["x"]
-		current_y = current_parents["y"]
-
-		if not current_x and not current_y:
-			maze_done = True
-
-def build_path_from_position(grid: Dict, parent_grid: Dict, current_x: int, current_y: int, base_tile_type: TileTypeEnum, new_tile_type: TileTypeEnum, movement_distance: int):
-
-	path_done = False
-
-	while path_done is False:
-		direction = get_random_valid_direction_for_placement(grid, current_x, current_y, movement_distance, base_tile_type)
-
-		if direction == DirectionEnum.RIGHT: # Positive X
-			for i in range(1, movement_distance + 1):
-				grid[current_x + i][current_y] = GridGenerator.tileset.get_tile_for_type(new_tile_type)
-			parent_grid[current_x + movement_distance][current_y] = {"x": current_x, "y": current_y}
-			current_x = current_x + movement_distance
-
-		elif direction == DirectionEnum.LEFT: # Negative X
-			for i in range(1, movement_distance + 1):
-				grid[current_x - i][current_y] = GridGenerator.tileset.get_tile_for_type(new_tile_type)
-			parent_grid[current_x - movement_distance][current_y] = {"x": current_x, "y": current_y}
-			current_x = current_x - movement_distance
-
-		elif direction == DirectionEnum.DOWN: # Positive Y
-			for i in range(1, movement_distance + 1):
-				grid[current_x][current_y + i] = GridGenerator.tileset.get_tile_for_type(new_tile_type)
-			parent_grid[current_x][current_y + movement_distance] = {"x": current_x, "y": current_y}
-			current_y = current_y + movement_distance
-
-		elif direction == DirectionEnum.UP: # negative X
-			for i in range(1, movement_distance + 1):
-				grid[current_x][current_y - i] = GridGenerator.tileset.get_tile_for_type(new_tile_type)
-			parent_grid[current_x][current_y - movement_distance] = {"x": current_x, "y": current_y}
-			current_y = current_y - movement_distance
-
-		elif direction is None:
-			path_done = True
-
-	return current_x, current_y
-
-def get_random_valid_direction_for_placement(grid: Dict, x: int, y: int, placement_length: int, valid_placement_type: TileTypeEnum) -> DirectionEnum:
-	direction_list = [1,2,3,4]
-	shuffle(direction_list)
-	for direction in direction_list:
-		
-
-		if direction == DirectionEnum.RIGHT.value: # Positive X
-			if grid[x + placement_length][y].tile_type == valid_placement_type:
-				return DirectionEnum.RIGHT
-			
-		if direction == DirectionEnum.DOWN.value: # Positive Y
-			if grid[x][y + placement_length].tile_type == valid_placement_type:
-				return DirectionEnum.DOWN
-
-		if direction == DirectionEnum.LEFT.value: # Negative X
-			if grid[x - placement_length][y].tile_type == valid_placement_type:
-				return DirectionEnum.LEFT
-			
-		if direction == DirectionEnum.UP.value: # Negative Y
-			if grid[x][y - placement_length].tile_type == valid_placement_type:
-				return DirectionEnum.UP
-	
-	return None
+def crop_grid(grid: GridStorage, collision_grid: np.ndarray, width: int, height: int):
+	if width > grid.width or height > grid.height:
+		raise ValueError("crop must fit inside the grid. provided: " + str(width) + " " + str(height))
+	if width == grid.width and height == grid.height:
+		return grid, collision_grid
+
+	new_grid = GridStorage(width, height, grid.tileset, tile_types = grid.tile_types[:width, :height].copy())
+	return new_grid, collision_grid[:width, :height].copy()
+
+
+def trim_edges(grid: GridStorage, edge_tile_type: TileTypeEnum, replacement_tile_type: TileTypeEnum, minimum_edges: int, pass_through_count: int):
+	for step in trim_edges_in_steps(grid, edge_tile_type, replacement_tile_type, minimum_edges, pass_through_count):
+		pass
+
+
+def trim_edges_in_steps(grid: GridStorage, edge_tile_type: TileTypeEnum, replacement_tile_type: TileTypeEnum, minimum_edges: int, pass_through_count: int, passes_per_step: int = 8):
+	# yields after every passes_per_step passes, grid holds the trimmed tiles once it is exhausted
+	if pass_through_count < 1:
+		return
+
+	edge_index = GridStorage.get_index_for_tile_type(edge_tile_type)
+	replacement_index = GridStorage.get_index_for_tile_type(replacement_tile_type)
+
+	# edge cells padded by one so the four neighbour lookups never leave the array, cells past the grid never count as edges
+	padded_edges = np.pad(grid.tile_types == edge_index, 1)
+
+	# the first pass scans every cell
+	edge_counts = np.zeros((grid.width, grid.height), dtype=np.uint8)
+	for x_offset, y_offset in edge_offsets:
+		edge_counts += padded_edges[1 + x_offset:grid.width + 1 + x_offset, 1 + y_offset:grid.height + 1 + y_offset]
+	changed_x, changed_y = np.nonzero((edge_counts <= minimum_edges) & (grid.tile_types != replacement_index))
+
+	for i in range(1, pass_through_count + 1):
+		grid.tile_types[changed_x, changed_y] = replacement_index
+		padded_edges[changed_x + 1, changed_y + 1] = replacement_index == edge_index
+
+		if i == pass_through_count or len(changed_x) == 0:
+			break
+		if i % passes_per_step == 0:
+			yield
+
+		# a cell only counts its four neighbours, so only cells next to a change can be trimmed on the next pass
+		neighbour_x = np.concatenate([changed_x + x_offset for x_offset, y_offset in edge_offsets])
+		neighbour_y = np.concatenate([changed_y + y_offset for x_offset, y_offset in edge_offsets])
+		in_bounds = (neighbour_x >= 0) & (neighbour_x < grid.width) & (neighbour_y >= 0) & (neighbour_y < grid.height)
+		worklist_x, worklist_y = np.unravel_index(np.unique(np.ravel_multi_index((neighbour_x[in_bounds], neighbour_y[in_bounds]), (grid.width, grid.height))), (grid.width, grid.height))
+
+		worklist_counts = np.zeros(len(worklist_x), dtype=np.uint8)
+		for x_offset, y_offset in edge_offsets:
+			worklist_counts += padded_edges[worklist_x + 1 + x_offset, worklist_y + 1 + y_offset]
+		trimmed = (worklist_counts <= minimum_edges) & (grid.tile_types[worklist_x, worklist_y] != replacement_index)
+		changed_x, changed_y = worklist_x[trimmed], worklist_y[trimmed]
+
+
+def bridge_gaps(grid: GridStorage, gap_tile_type: TileTypeEnum, edge_tile_type: TileTypeEnum, bridge_tile_type: TileTypeEnum, max_bridge_length: int, fill_chance: float, random_generator: Random = None):
+	if random_generator is None:
+		random_generator = Random(randrange(0, 2 ** 32))
+
+	gap_mask = grid.get_tile_type_mask(gap_tile_type)
+	edge_mask = grid.get_tile_type_mask(edge_tile_type)
+
+	valid_horizontal, horizontal_starts, horizontal_ends = find_bridges_along_first_axis(gap_mask, edge_mask, max_bridge_length)
+	valid_vertical, vertical_starts, vertical_ends = find_bridges_along_first_axis(gap_mask.T, edge_mask.T, max_bridge_length)
+	valid_vertical, vertical_starts, vertical_ends = valid_vertical.T, vertical_starts.T, vertical_ends.T
+
+	# every gap cell with a valid bridge through it picks one, so a gap spanned from several of its cells gets several chances to fill
+	# the choices and fill rolls are drawn for all cells at once from a numpy generator seeded by the stage random
+	array_random = np.random.default_rng(random_generator.getrandbits(128))
+	xs, ys = np.nonzero(valid_horizontal | valid_vertical)
+	has_both = valid_horizontal[xs, ys] & valid_vertical[xs, ys]
+	choose_vertical = np.where(has_both, array_random.random(len(xs)) < 0.5, valid_vertical[xs, ys])
+	filled = array_random.integers(0, 100000, len(xs)) / 1000 <= fill_chance
+
+	horizontal = filled & ~choose_vertical
+	vertical = filled & choose_vertical
+	bridge_mask = get_run_mask(grid.tile_types.shape, horizontal_starts[xs[horizontal], ys[horizontal]], horizontal_ends[xs[horizontal], ys[horizontal]] + 1, ys[horizontal], 0) |\
+		get_run_mask(grid.tile_types.shape, vertical_starts[xs[vertical], ys[vertical]], vertical_ends[xs[vertical], ys[vertical]] + 1, xs[vertical], 1)
+	grid.tile_types[bridge_mask] = GridStorage.get_index_for_tile_type(bridge_tile_type)
+
+
+def get_run_mask(shape: Tuple[int, int], starts: np.ndarray, ends: np.ndarray, others: np.ndarray, axis: int) -> np.ndarray:
+	# marks the runs from start (inclusive) to end (exclusive) along axis at the given position on the other axis, overlapping runs are fine
+	counts_shape = list(shape)
+	counts_shape[axis] = counts_shape[axis] + 1
+	run_counts = np.zeros(counts_shape, dtype=np.int32)
+	if axis == 0:
+		np.add.at(run_counts, (starts, others), 1)
+		np.add.at(run_counts, (ends, others), -1)
+		return run_counts.cumsum(axis=0)[:-1] > 0
+	np.add.at(run_counts, (others, starts), 1)
+	np.add.at(run_counts, (others, ends), -1)
+	return run_counts.cumsum(axis=1)[:, :-1] > 0
+
+
+def find_bridges_along_first_axis(gap_mask: np.ndarray, edge_mask: np.ndarray, max_bridge_length: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+	# a gap cell can be bridged along the axis when the run of gaps through it is no longer than max_bridge_length, ends in an
+	# edge tile on both sides within max_bridge_length + 1 steps, and every other cell of the run has gaps on both sides of it
+	length, breadth = gap_mask.shape
+	positions = np.arange(0, length)[:, np.newaxis]
+
+	corridor_mask = gap_mask.copy()
+	corridor_mask[:, 1:] &= gap_mask[:, :-1]
+	corridor_mask[:, :-1] &= gap_mask[:, 1:]
+	corridor_mask[:, 0] = False
+	corridor_mask[:, -1] = False
+
+	# the first position at or after each cell that is not a gap, and the last at or before it, found with running minimums and maximums
+	next_non_gap = np.minimum.accumulate(np.where(gap_mask, length, positions)[::-1], axis=0)[::-1]
+	previous_non_gap = np.maximum.accumulate(np.where(gap_mask, -1, positions), axis=0)
+	next_non_corridor = np.minimum.accumulate(np.where(corridor_mask, length, positions)[::-1], axis=0)[::-1]
+	previous_non_corridor = np.maximum.accumulate(np.where(corridor_mask, -1, positions), axis=0)
+
+	valid = np.zeros((length, breadth), dtype=bool)
+	bridge_starts = np.zeros((length, breadth), dtype=np.int64)
+	bridge_ends = np.zeros((length, breadth), dtype=np.int64)
+	if length < 2 * max_bridge_length + 3 or breadth < 4:
+		return valid, bridge_starts, bridge_ends
+
+	# cells on either side of the cells that can hold a bridge centre, which keep max_bridge_length + 1 cells between them and the grid edge
+	centres = slice(max_bridge_length + 1, length - max_bridge_length - 1)
+	afters = slice(max_bridge_length + 2, length - max_bridge_length)
+	befores = slice(max_bridge_length, length - max_bridge_length - 2)
+	sides = slice(2, breadth - 1)
+
+	end_stop = next_non_gap[afters, sides]
+	start_stop = previous_non_gap[befores, sides]
+	centre_positions = positions[centres]
+
+	after_edge = np.take_along_axis(edge_mask[:, sides], np.minimum(end_stop, length - 1), axis=0)
+	before_edge = np.take_along_axis(edge_mask[:, sides], np.maximum(start_stop, 0), axis=0)
+
+	valid[centres, sides] = gap_mask[centres, sides] &\
+		(end_stop < length) & after_edge & (end_stop - centre_positions <= max_bridge_length + 1) & (next_non_corridor[afters, sides] >= end_stop) &\
+		(start_stop >= 0) & before_edge & (centre_positions - start_stop <= max_bridge_length + 1) & (previous_non_corridor[befores, sides] <= start_stop) &\
+		(end_stop - start_stop - 1 <= max_bridge_length)
+	bridge_starts[centres, sides] = start_stop + 1
+	bridge_ends[centres, sides] = end_stop - 1
+
+	return valid, bridge_starts, bridge_ends
+
+
+def generate_maze(grid: GridStorage, base_tile_type: TileTypeEnum, new_tile_type: TileTypeEnum, maze_path_distance: int, random_generator: Random = None):
+	if maze_path_distance < 1:
+		raise ValueError("maze_path_distance must be a whole number more than 0. provided: " + str(maze_path_distance))
+
+	if random_generator is None:
+		random_generator = Random(randrange(0, 2 ** 32))
+
+	base_mask = grid.get_tile_type_mask(base_tile_type)
+	starting_positions = np.flatnonzero(base_mask[1:, 1:])
+	if len(starting_positions) == 0:
+		return
+
+	starting_x, starting_y = np.unravel_index(starting_positions[random_generator.randrange(0, len(starting_positions))], (grid.width - 1, grid.height - 1))
+	starting_x = int(starting_x) + 1
+	starting_y = int(starting_y) + 1
+
+	# paths only ever end maze_path_distance apart, so the maze is carved on the lattice of cells in step with the start
+	lattice_x = starting_x % maze_path_distance
+	lattice_y = starting_y % maze_path_distance
+	open_nodes = base_mask[lattice_x::maze_path_distance, lattice_y::maze_path_distance]
+	node_width, node_height = open_nodes.shape
+	is_open = bytearray(np.ascontiguousarray(open_nodes).tobytes())
+
+	# an order to try the four directions in for every look for a new path, each look either carves to a new node or retires one so two per node is enough
+	direction_orders = list(permutations(direction_offsets.values()))
+	order_rng = np.random.default_rng(random_generator.getrandbits(64))
+	order_choices = order_rng.integers(0, len(direction_orders), size=2 * node_width * node_height + 1, dtype=np.uint8).tobytes()
+	order_count = 0
+
+	starting_node = (starting_x // maze_path_distance) * node_height + starting_y // maze_path_distance
+	is_open[starting_node] = False
+	carved_from = []
+	carved_to = []
+
+	stack = [starting_node]
+	while len(stack) > 0:
+		node = stack[-1]
+		node_x, node_y = divmod(node, node_height)
+
+		next_node = None
+		for x_offset, y_offset in direction_orders[order_choices[order_count]]:
+			neighbour_x = node_x + x_offset
+			neighbour_y = node_y + y_offset
+			if 0 <= neighbour_x < node_width and 0 <= neighbour_y < node_height and is_open[neighbour_x * node_height + neighbour_y]:
+				next_node = neighbour_x * node_height + neighbour_y
+				break
+		order_count = order_count + 1
+
+		if next_node is None:
+			stack.pop()
+		else:
+			is_open[next_node] = False
+			carved_from.append(node)
+			carved_to.append(next_node)
+			stack.append(next_node)
+
+	new_tile_index = GridStorage.get_index_for_tile_type(new_tile_type)
+	grid.tile_types[starting_x, starting_y] = new_tile_index
+	if len(carved_to) == 0:
+		return
+
+	from_x, from_y = np.divmod(np.array(carved_from, dtype=np.int64), node_height)
+	to_x, to_y = np.divmod(np.array(carved_to, dtype=np.int64), node_height)
+	step_x = to_x - from_x
+	step_y = to_y - from_y
+	from_x = from_x * maze_path_distance + lattice_x
+	from_y = from_y * maze_path_distance + lattice_y
+	for i in range(1, maze_path_distance + 1):
+		grid.tile_types[from_x + step_x * i, from_y + step_y * i] = new_tile_index
@@ -0,0 +1,54 @@
+import numpy as np
+from typing import Dict, List
+from level.tile_type_enum import TileTypeEnum
+from level.tileset_loader import TileSet, TileType
+
+class GridStorage():
+
+    # palette indices follow TileTypeEnum order so stored arrays mean the same thing whichever tileset is loaded
+    palette: List[TileTypeEnum] = list(TileTypeEnum)
+    palette_indices: Dict[TileTypeEnum, int] = {tile_type: index for index, tile_type in enumerate(TileTypeEnum)}
+
+    def __init__(self, width: int, height: int, tileset: TileSet = None, fill_tile_type: TileTypeEnum = TileTypeEnum.BLANK, tile_types: np.ndarray = None):
+        self.width = width
+        self.height = height
+
+        if tile_types is None:
+            self.tile_types = np.full((width, height), GridStorage.get_index_for_tile_type(fill_tile_type), dtype=np.uint8)
+        else:
+            if tile_types.shape != (width, height):
+                raise ValueError("tile_types shape must match grid dimensions. provided: " + str(tile_types.shape) + " expected: " + str((width, height)))
+            self.tile_types = tile_types
+
+        self.set_tileset(tileset)
+
+    @staticmethod
+    def get_index_for_tile_type(tile_type: TileTypeEnum) -> int:
+        return GridStorage.palette_indices[tile_type]
+
+    def set_tileset(self, tileset: TileSet):
+        self.tileset = tileset
+        self.tile_palette: List[TileType] = []
+        for tile_type in GridStorage.palette:
+            if tileset is not None and tileset.has_tile_for_type(tile_type):
+                self.tile_palette.append(tileset.get_tile_for_type(tile_type))
+            else:
+                self.tile_palette.append(None)
+
+    def get_tile_type(self, x: int, y: int) -> TileTypeEnum:
+        return GridStorage.palette[self.tile_types[x, y]]
+
+    def get_tile(self, x: int, y: int) -> TileType:
+        return self.tile_palette[self.tile_types[x, y]]
+
+    def set_tile_type(self, x: int, y: int, tile_type: TileTypeEnum):
+        self.tile_types[x, y] = GridStorage.palette_indices[tile_type]
+
+    def get_tile_type_mask(self, tile_type: TileTypeEnum) -> np.ndarray:
+        return self.tile_types == GridStorage.palette_indices[tile_type]
+
+    def set_tile_type_for_mask(self, mask: np.ndarray, tile_type: TileTypeEnum):
+        self.tile_types[mask] = GridStorage.palette_indices[tile_type]
+
+    def copy(self) -> 'GridStorage':
+        return GridStorage(self.width, self.height, self.tileset, tile_types = self.tile_types.copy())
@@ -0,0 +1,116 @@
+import json
+import struct
+import numpy as np
+from uuid import UUID
+from typing import Dict, List
+from level.tile_type_enum import DecoratorEnum
+from level.tileset_loader import TileSet
+from level.grid_generator_helper import Decoration
+
+# level file layout, all values little endian:
+#   header      magic, format version, width, height, then (offset, size) for each section below
+#   tiles       width * height uint8 palette indices, x major to match GridStorage.tile_types
+#   collision   width * height bits packed with np.packbits, x major
+#   decorations one decoration_dtype record per decoration
+#   metadata    utf-8 json
+# sections start on section_alignment byte boundaries so they can be mapped straight into arrays
+LEVEL_FILE_MAGIC = b"BHDL"
+LEVEL_FILE_VERSION = 2
+header_format = "<4sHHIIQQQQQQQQ"
+section_alignment = 64
+
+# id holds the 16 bytes of the decoration's uuid, so a loaded level has the same ids it was generated with
+decoration_dtype = np.dtype([("x", "<u4"), ("y", "<u4"), ("decorator_type", "u1"), ("out_of_bounds", "u1"), ("id", "V16")])
+decorator_palette: List[DecoratorEnum] = list(DecoratorEnum)
+
+class LevelData():
+
+    def __init__(self, tile_types: np.ndarray, collision_grid: np.ndarray, decorations: np.ndarray, metadata: Dict):
+        if tile_types.shape != collision_grid.shape:
+            raise ValueError("tile_types and collision_grid must have the same shape. provided: " + str(tile_types.shape) + " " + str(collision_grid.shape))
+
+        self.width, self.height = tile_types.shape
+        self.tile_types = tile_types
+        self.collision_grid = collision_grid
+        self.decorations = decorations
+        self.metadata = metadata
+
+    @staticmethod
+    def from_generated(tile_types: np.ndarray, collision_grid: np.ndarray, decorations: List[Decoration], metadata: Dict) -> 'LevelData':
+        # the records are built in one go rather than written row by row, ids are read straight from their hex digits
+        decoration_records = np.array([
+            (
+                decoration.x_pos,
+                decoration.y_pos,
+                decorator_palette.index(decoration.type.decorator_type),
+                decoration.out_of_bounds,
+                bytes.fromhex(decoration.id.replace("-", ""))
+            ) for decoration in decorations
+        ], dtype=decoration_dtype)
+        return LevelData(tile_types, collision_grid, decoration_records, metadata)
+
+    def create_decorations(self, tileset: TileSet, start: int = 0, end: int = None) -> List[Decoration]:
+        decorations = []
+        for record in self.decorations[start:end]:
+            decorations.append(
+                Decoration(
+                    int(record["x"]),
+                    int(record["y"]),
+                    tileset.get_decorator_for_type(decorator_palette[record["decorator_type"]]),
+                    bool(record["out_of_bounds"]),
+                    str(UUID(bytes=record["id"].tobytes()))
+                )
+            )
+        return decorations
+
+
+def align_offset(offset: int) -> int:
+    return (offset + section_alignment - 1) // section_alignment * section_alignment
+
+
+def save_level(level_filename: str, level_data: LevelData):
+    sections = [
+        np.ascontiguousarray(level_data.tile_types, dtype=np.uint8).tobytes(),
+        np.packbits(np.ascontiguousarray(level_data.collision_grid, dtype=bool)).tobytes(),
+        np.ascontiguousarray(level_data.decorations, dtype=decoration_dtype).tobytes(),
+        json.dumps(level_data.metadata).encode("utf-8")
+    ]
+
+    section_table = []
+    offset = align_offset(struct.calcsize(header_format))
+    for section in sections:
+        section_table.extend([offset, len(section)])
+        offset = align_offset(offset + len(section))
+
+    with open(level_filename, "wb") as level_file:
+        level_file.write(struct.pack(header_format, LEVEL_FILE_MAGIC, LEVEL_FILE_VERSION, 0, level_data.width, level_data.height, *section_table))
+        for index, section in enumerate(sections):
+            level_file.seek(section_table[index * 2])
+            level_file.write(section)
+
+
+def load_level(level_filename: str) -> LevelData:
+    # the file is mapped copy on write, tile edits made while playing never reach the file on disk
+    level_map = np.memmap(level_filename, dtype=np.uint8, mode="c")
+
+    header_size = struct.calcsize(header_format)
+    if level_map.shape[0] < header_size:
+        raise ValueError("level file is too small to be a level: " + level_filename)
+
+    header = struct.unpack(header_format, level_map[:header_size].tobytes())
+    magic, version, flags, width, height = header[:5]
+    tile_offset, tile_size, collision_offset, collision_size, decoration_offset, decoration_size, metadata_offset, metadata_size = header[5:]
+
+    if magic != LEVEL_FILE_MAGIC:
+        raise ValueError("not a level file: " + level_filename)
+    if version != LEVEL_FILE_VERSION:
+        raise ValueError("unsupported level file version " + str(version) + " in " + level_filename + ", expected " + str(LEVEL_FILE_VERSION))
+    if tile_size != width * height:
+        raise ValueError("level file tile section does not match its dimensions: " + level_filename)
+
+    tile_types = level_map[tile_offset:tile_offset + tile_size].reshape((width, height))
+    collision_grid = np.unpackbits(level_map[collision_offset:collision_offset + collision_size], count=width * height).view(bool).reshape((width, height))
+    decorations = level_map[decoration_offset:decoration_offset + decoration_size].view(decoration_dtype)
+    metadata = json.loads(level_map[metadata_offset:metadata_offset + metadata_size].tobytes().decode("utf-8"))
+
+    return LevelData(tile_types, collision_grid, decorations, metadata)
@@ -0,0 +1,43 @@
+import os
+import hashlib
+import numpy as np
+from typing import Dict
+from level.level import LevelData, LEVEL_FILE_VERSION, load_level, save_level
+from level.grid_generator_helper import GridGenerator
+
+class LevelCache():
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.tileset_hashes: Dict[str, str] = {}
+
+    def get_tileset_hash(self, tileset_filename: str) -> str:
+        if tileset_filename not in self.tileset_hashes.keys():
+            with open("media/tileset_data/" + tileset_filename, "rb") as tileset_file:
+                self.tileset_hashes[tileset_filename] = hashlib.sha256(tileset_file.read()).hexdigest()
+        return self.tileset_hashes[tileset_filename]
+
+    def get_level_filename(self, seed: int, width: int, height: int, tileset_filename: str) -> str:
+        # everything that decides what a seed generates is part of the name, so a stale level is never found rather than needing to be cleared
+        return os.path.join(
+            self.directory,
+            str(seed) + "_" + str(width) + "x" + str(height) + "_" + self.get_tileset_hash(tileset_filename)[:16] + "_v" + str(GridGenerator.generator_version) + "_f" + str(LEVEL_FILE_VERSION) + ".level"
+        )
+
+    def load(self, seed: int, width: int, height: int, tileset_filename: str) -> LevelData:
+        level_filename = self.get_level_filename(seed, width, height, tileset_filename)
+        if not os.path.exists(level_filename):
+            return None
+
+        level_data = load_level(level_filename)
+        # copied out of the file mapping so the level can be handed between processes and the file replaced while it is in use
+        return LevelData(np.array(level_data.tile_types), np.array(level_data.collision_grid), np.array(level_data.decorations), level_data.metadata)
+
+    def save(self, seed: int, width: int, height: int, tileset_filename: str, level_data: LevelData):
+        os.makedirs(self.directory, exist_ok = True)
+        level_filename = self.get_level_filename(seed, width, height, tileset_filename)
+
+        # written beside the final name then moved into place, so other processes never load a half written level
+        temporary_filename = level_filename + "." + str(os.getpid()) + ".tmp"
+        save_level(temporary_filename, level_data)
+        os.replace(temporary_filename, level_filename)
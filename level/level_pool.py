@@ -0,0 +1,156 @@
+import os
+import random
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from queue import Empty
+from typing import Deque, Dict, Tuple
+from level.tileset_loader import load_tileset
+from level.grid_generator_helper import MazeGenerator
+from level.level import LevelData
+from level.level_cache import LevelCache
+
+# workers are spawned rather than forked so they never inherit the display or audio state of the game process
+process_context = multiprocessing.get_context("spawn")
+
+# set in each worker process by start_generation_worker
+worker_progress_queue = None
+
+def generate_level_data(width: int, height: int, tileset_filename: str, seed: int = None, progress_callback = None, level_cache: LevelCache = None) -> LevelData:
+    if seed is not None and level_cache is not None:
+        level_data = level_cache.load(seed, width, height, tileset_filename)
+        if level_data is not None:
+            return level_data
+
+    tileset = load_tileset(tileset_filename)
+    generator = MazeGenerator(width, height, tileset, progress_callback, seed)
+    storage, collision_grid, decorations = generator.generate_grid()
+    level_data = LevelData.from_generated(storage.tile_types, collision_grid, decorations, {"tileset_filename": tileset_filename, "seed": generator.seed})
+
+    if level_cache is not None:
+        level_cache.save(generator.seed, width, height, tileset_filename, level_data)
+    return level_data
+
+
+def start_generation_worker(progress_queue):
+    global worker_progress_queue
+    worker_progress_queue = progress_queue
+
+    # the game process keeps priority over the workers whenever they share a core
+    if hasattr(os, "nice"):
+        os.nice(10)
+
+
+def run_generation_job(width: int, height: int, tileset_filename: str, seed: int, cache_directory: str) -> LevelData:
+    return generate_level_data(width, height, tileset_filename, seed,
+        lambda fraction_complete, stage: worker_progress_queue.put((seed, fraction_complete, stage)),
+        LevelCache(cache_directory) if cache_directory is not None else None)
+
+
+class LevelPool():
+
+    def __init__(self, width: int, height: int, tileset_filename: str, depth: int = 2, memory_cap: int = 256 * 1024 * 1024, max_workers: int = None, seed: int = None, cache_directory: str = None):
+        if depth < 1:
+            raise ValueError("depth must be a whole number more than 0. provided: " + str(depth))
+
+        self.width = width
+        self.height = height
+        self.tileset_filename = tileset_filename
+        self.depth = depth
+        self.memory_cap = memory_cap
+        # when set, levels are saved under this directory and a seed seen before is loaded rather than generated
+        self.cache_directory = cache_directory
+
+        # seeds count up from a random starting point so every level in a run is different
+        self.next_seed = seed if seed is not None else random.randrange(0, 2 ** 32)
+
+        self.ready_levels: Deque[LevelData] = deque()
+        self.ready_bytes = 0
+        self.pending_levels: Deque[Tuple[int, Future]] = deque()
+        self.progress: Dict[int, Tuple[float, str]] = {}
+        # a failed level is dropped and another seed takes its place, only a pool that keeps failing is treated as broken
+        self.max_failures_in_a_row = 3
+        self.failures_in_a_row = 0
+        # until a level has come back its size is guessed from one byte of tiles and one of collision per cell
+        self.estimated_level_bytes = width * height * 2
+
+        self.progress_queue = process_context.Queue()
+        self.executor = ProcessPoolExecutor(max_workers, mp_context = process_context, initializer = start_generation_worker, initargs = (self.progress_queue,))
+        self.refill()
+
+    @staticmethod
+    def get_level_bytes(level_data: LevelData) -> int:
+        return level_data.tile_types.nbytes + level_data.collision_grid.nbytes + level_data.decorations.nbytes
+
+    def get_committed_bytes(self) -> int:
+        return self.ready_bytes + len(self.pending_levels) * self.estimated_level_bytes
+
+    def refill(self):
+        while len(self.ready_levels) + len(self.pending_levels) < self.depth:
+            # the pool always keeps at least one level coming, however small the memory cap
+            if len(self.ready_levels) + len(self.pending_levels) > 0 and self.get_committed_bytes() + self.estimated_level_bytes > self.memory_cap:
+                break
+
+            seed = self.next_seed
+            self.next_seed = (self.next_seed + 1) % 2 ** 32
+            self.pending_levels.append((seed, self.executor.submit(run_generation_job, self.width, self.height, self.tileset_filename, seed, self.cache_directory)))
+
+    def update(self):
+        while True:
+            try:
+                seed, fraction_complete, stage = self.progress_queue.get_nowait()
+            except Empty:
+                break
+            self.progress[seed] = (fraction_complete, stage)
+
+        # levels are handed out in the order they were asked for, so only the oldest pending levels are collected
+        while len(self.pending_levels) > 0 and self.pending_levels[0][1].done():
+            seed, future = self.pending_levels.popleft()
+            self.progress.pop(seed, None)
+            if future.exception() is not None:
+                self.handle_failed_level(seed, future.exception())
+                continue
+
+            self.failures_in_a_row = 0
+            level_data = future.result()
+            level_bytes = LevelPool.get_level_bytes(level_data)
+            self.estimated_level_bytes = max(self.estimated_level_bytes, level_bytes)
+            self.ready_levels.append(level_data)
+            self.ready_bytes = self.ready_bytes + level_bytes
+
+        self.refill()
+
+    def handle_failed_level(self, seed: int, exception: BaseException):
+        if isinstance(exception, BrokenProcessPool):
+            raise RuntimeError("the level generation workers have stopped: " + repr(exception))
+
+        self.failures_in_a_row = self.failures_in_a_row + 1
+        if self.failures_in_a_row >= self.max_failures_in_a_row:
+            raise RuntimeError("level generation failed " + str(self.failures_in_a_row) + " times in a row, last for seed " + str(seed) + ": " + repr(exception))
+
+        # refill submits the next seed in place of this one
+        print("level generation failed for seed " + str(seed) + ", trying another seed: " + repr(exception))
+
+    def has_ready_level(self) -> bool:
+        return len(self.ready_levels) > 0
+
+    def pop(self) -> LevelData:
+        if not self.has_ready_level():
+            raise ValueError("no level is ready, check has_ready_level first")
+
+        level_data = self.ready_levels.popleft()
+        self.ready_bytes = self.ready_bytes - LevelPool.get_level_bytes(level_data)
+        self.refill()
+        return level_data
+
+    def get_next_level_progress(self) -> Tuple[float, str]:
+        if self.has_ready_level():
+            return 1, "ready"
+        if len(self.pending_levels) == 0:
+            return 0, "waiting"
+        return self.progress.get(self.pending_levels[0][0], (0, "starting"))
+
+    def shutdown(self):
+        self.executor.shutdown(wait = False, cancel_futures = True)
+        self.progress_queue.close()
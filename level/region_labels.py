@@ -0,0 +1,78 @@
+import numpy as np
+
+class RegionLabels():
+
+    def __init__(self, mask: np.ndarray):
+        self.width, self.height = mask.shape
+        # labels are 1 based, 0 marks cells outside every region
+        self.labels = np.zeros((self.width, self.height), dtype=np.int32)
+        self.region_count = 0
+        self.sizes = np.zeros(0, dtype=np.int64)
+        # min x, min y, max x, max y, all inclusive
+        self.bounding_boxes = np.zeros((0, 4), dtype=np.int64)
+        self.touching_edge = np.zeros(0, dtype=bool)
+
+        if mask.any():
+            self.label(np.ascontiguousarray(mask, dtype=bool))
+
+    def label(self, mask: np.ndarray):
+        # regions are found from runs of cells down each column, then runs that share an edge with a run in the next column are joined
+        run_starts = mask.copy()
+        run_starts[:, 1:] &= ~mask[:, :-1]
+        run_ends = mask.copy()
+        run_ends[:, :-1] &= ~mask[:, 1:]
+
+        run_start_indices = np.flatnonzero(run_starts)
+        run_end_indices = np.flatnonzero(run_ends)
+        run_count = len(run_start_indices)
+
+        run_ids = np.cumsum(run_starts.ravel(), dtype=np.int64).reshape(mask.shape) - 1
+
+        # a pair of overlapping runs is only taken where the overlap begins, so each pair is joined once per overlap rather than once per cell
+        connected = mask[:-1, :] & mask[1:, :]
+        overlap_starts = connected & (run_starts[:-1, :] | run_starts[1:, :])
+        first_runs = run_ids[:-1, :][overlap_starts]
+        second_runs = run_ids[1:, :][overlap_starts]
+
+        # every run points at the lowest run it is joined to, so each region ends up named after its first run in x major order
+        parents = np.arange(run_count, dtype=np.int64)
+        while len(first_runs) > 0 and (parents[first_runs] != parents[second_runs]).any():
+            lowest_parents = np.minimum(parents[first_runs], parents[second_runs])
+            np.minimum.at(parents, parents[first_runs], lowest_parents)
+            np.minimum.at(parents, parents[second_runs], lowest_parents)
+            while True:
+                grandparents = parents[parents]
+                if (grandparents == parents).all():
+                    break
+                parents = grandparents
+
+        roots, run_labels = np.unique(parents, return_inverse=True)
+        run_labels = run_labels + 1
+        self.region_count = len(roots)
+
+        self.labels[mask] = run_labels[run_ids[mask]]
+
+        run_x = run_start_indices // self.height
+        run_start_y = run_start_indices % self.height
+        run_end_y = run_end_indices % self.height
+
+        self.sizes = np.bincount(run_labels, weights=run_end_y - run_start_y + 1, minlength=self.region_count + 1)[1:].astype(np.int64)
+
+        self.bounding_boxes = np.zeros((self.region_count, 4), dtype=np.int64)
+        self.bounding_boxes[:, 0:2] = np.iinfo(np.int64).max
+        np.minimum.at(self.bounding_boxes[:, 0], run_labels - 1, run_x)
+        np.minimum.at(self.bounding_boxes[:, 1], run_labels - 1, run_start_y)
+        np.maximum.at(self.bounding_boxes[:, 2], run_labels - 1, run_x)
+        np.maximum.at(self.bounding_boxes[:, 3], run_labels - 1, run_end_y)
+
+        self.touching_edge = (self.bounding_boxes[:, 0] == 0) | (self.bounding_boxes[:, 1] == 0) |\
+             (self.bounding_boxes[:, 2] == self.width - 1) | (self.bounding_boxes[:, 3] == self.height - 1)
+
+    def get_size(self, label: int) -> int:
+        return int(self.sizes[label - 1])
+
+    def get_bounding_box(self, label: int):
+        return tuple(int(value) for value in self.bounding_boxes[label - 1])
+
+    def is_touching_edge(self, label: int) -> bool:
+        return bool(self.touching_edge[label - 1])
@@ -0,0 +1,61 @@
+import pygame
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+class ScaledImageCache():
+
+    def __init__(self, byte_budget: int = 64 * 1024 * 1024):
+        if byte_budget < 0:
+            raise ValueError("byte_budget must not be negative. provided: " + str(byte_budget))
+
+        self.byte_budget = byte_budget
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.scaled_images: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def get_surface_byte_size(surface: pygame.Surface) -> int:
+        return surface.get_pitch() * surface.get_height()
+
+    def get_scaled_image(self, image: pygame.Surface, size: Tuple[int, int]) -> pygame.Surface:
+        # the source surface is kept in the key so its id cannot be reused by another image while the entry lives
+        cache_key = (id(image), size)
+
+        if cache_key in self.scaled_images.keys():
+            self.hits = self.hits + 1
+            self.scaled_images.move_to_end(cache_key)
+            return self.scaled_images[cache_key][1]
+
+        self.misses = self.misses + 1
+        scaled_image = pygame.transform.scale(image, size)
+        # matching the display pixel format up front saves converting every pixel on every blit
+        if pygame.display.get_surface() is not None:
+            scaled_image = scaled_image.convert_alpha()
+        self.scaled_images[cache_key] = (image, scaled_image)
+        self.used_bytes = self.used_bytes + ScaledImageCache.get_surface_byte_size(scaled_image)
+        self.evict_to_budget()
+
+        return scaled_image
+
+    def evict_to_budget(self):
+        # the most recently used entry always stays, even when it is larger than the whole budget on its own
+        while self.used_bytes > self.byte_budget and len(self.scaled_images) > 1:
+            cache_key, (image, scaled_image) = self.scaled_images.popitem(last=False)
+            self.used_bytes = self.used_bytes - ScaledImageCache.get_surface_byte_size(scaled_image)
+            self.evictions = self.evictions + 1
+
+    def clear(self):
+        self.scaled_images = OrderedDict()
+        self.used_bytes = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self.scaled_images),
+            "used_bytes": self.used_bytes,
+            "byte_budget": self.byte_budget,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
@@ -0,0 +1,30 @@
+from typing import Any, Dict, List, Tuple
+
+class SpatialBucketGrid():
+
+    def __init__(self, bucket_size: int = 16):
+        if bucket_size < 1:
+            raise ValueError("bucket_size must be a whole number more than 0. provided: " + str(bucket_size))
+
+        self.bucket_size = bucket_size
+        self.buckets: Dict[Tuple[int, int], List[Tuple[int, Any]]] = {}
+        self.item_count = 0
+
+    def insert(self, x_pos: int, y_pos: int, item: Any):
+        bucket_key = (int(x_pos // self.bucket_size), int(y_pos // self.bucket_size))
+        if bucket_key not in self.buckets.keys():
+            self.buckets[bucket_key] = []
+        # the insertion count is kept so queries can hand items back in the order they were added
+        self.buckets[bucket_key].append((self.item_count, item))
+        self.item_count = self.item_count + 1
+
+    def query(self, start_x: int, end_x: int, start_y: int, end_y: int) -> List[Any]:
+        # returns the items in buckets touching the tile range, start inclusive and end exclusive
+        found_items = []
+        for bucket_x in range(int(start_x // self.bucket_size), int((end_x - 1) // self.bucket_size) + 1):
+            for bucket_y in range(int(start_y // self.bucket_size), int((end_y - 1) // self.bucket_size) + 1):
+                if (bucket_x, bucket_y) in self.buckets.keys():
+                    found_items.extend(self.buckets[(bucket_x, bucket_y)])
+
+        found_items.sort(key=lambda found_item: found_item[0])
+        return [item for insertion_index, item in found_items]
@@ -0,0 +1,153 @@
+import pygame
+from typing import Dict, List, Tuple
+from level.camera import Camera
+
+class TerrainChunk():
+
+    def __init__(self, chunk_x: int, chunk_y: int, surface: pygame.Surface, animated_cells: Dict['TileType', List[Tuple[int, int]]]):
+        self.chunk_x = chunk_x
+        self.chunk_y = chunk_y
+        self.surface = surface
+        self.animated_cells = animated_cells
+        self.baked_frames = {}
+        for tile in animated_cells.keys():
+            self.baked_frames[tile] = tile.get_current_frame()
+
+
+class TerrainChunkCache():
+
+    def __init__(self, grid: 'Grid', chunk_size: int = 32):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be a whole number more than 0. provided: " + str(chunk_size))
+
+        self.grid = grid
+        self.chunk_size = chunk_size
+        self.zoom_level = None
+        self.chunks: Dict[Tuple[int, int], TerrainChunk] = {}
+
+    def invalidate_all(self):
+        self.chunks = {}
+
+    def invalidate_cell(self, x: int, y: int):
+        chunk_key = (int(x / self.chunk_size), int(y / self.chunk_size))
+        if chunk_key in self.chunks.keys():
+            del self.chunks[chunk_key]
+
+    def get_chunk(self, chunk_x: int, chunk_y: int) -> TerrainChunk:
+        chunk_key = (chunk_x, chunk_y)
+        if chunk_key not in self.chunks.keys():
+            self.chunks[chunk_key] = self.build_chunk(chunk_x, chunk_y)
+        return self.chunks[chunk_key]
+
+    def build_chunk(self, chunk_x: int, chunk_y: int) -> TerrainChunk:
+        for chunk in self.build_chunk_in_steps(chunk_x, chunk_y, self.chunk_size):
+            pass
+        return chunk
+
+    def build_chunk_in_steps(self, chunk_x: int, chunk_y: int, columns_per_step: int = 2):
+        # yields None after every few columns so the work can be spread over frames, then yields the finished chunk
+        start_x = chunk_x * self.chunk_size
+        start_y = chunk_y * self.chunk_size
+        end_x = min(start_x + self.chunk_size, self.grid.width)
+        end_y = min(start_y + self.chunk_size, self.grid.height)
+
+        surface = pygame.Surface(((end_x - start_x) * self.zoom_level, (end_y - start_y) * self.zoom_level))
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+
+        tile_palette = self.grid.storage.tile_palette
+        animated_cells = {}
+        for step_start_x in range(start_x, end_x, columns_per_step):
+            # the blit list is built straight from the stored columns and handed to one Surface.blits call per step
+            palette_images = [tile.rendered_images[tile.get_current_frame()] if tile is not None else None for tile in tile_palette]
+            blit_sequence = []
+            for x in range(step_start_x, min(step_start_x + columns_per_step, end_x)):
+                surface_x = (x - start_x) * self.zoom_level
+                tile_column = self.grid.storage.tile_types[x, start_y:end_y].tolist()
+                mask_column = self.grid.connection_masks[x, start_y:end_y].tolist()
+                for y, tile_index, connection_mask in zip(range(start_y, end_y), tile_column, mask_column):
+                    tile = tile_palette[tile_index]
+                    if tile.is_animated():
+                        if tile not in animated_cells.keys():
+                            animated_cells[tile] = []
+                        animated_cells[tile].append((x, y))
+                    blit_sequence.append((palette_images[tile_index], (surface_x, (y - start_y) * self.zoom_level), tile.rendered_areas[connection_mask]))
+            surface.blits(blit_sequence, doreturn=False)
+            yield None
+
+        yield TerrainChunk(chunk_x, chunk_y, surface, animated_cells)
+
+    def build_visible_chunks_in_steps(self, camera: Camera):
+        if camera.zoom_level != self.zoom_level:
+            self.invalidate_all()
+            self.zoom_level = camera.zoom_level
+
+        start_chunk_x, end_chunk_x, start_chunk_y, end_chunk_y = self.get_visible_chunk_range(camera)
+        for chunk_x in range(start_chunk_x, end_chunk_x):
+            for chunk_y in range(start_chunk_y, end_chunk_y):
+                if (chunk_x, chunk_y) not in self.chunks.keys():
+                    for chunk in self.build_chunk_in_steps(chunk_x, chunk_y):
+                        if chunk is None:
+                            yield
+                    self.chunks[(chunk_x, chunk_y)] = chunk
+
+    def redraw_animated_cells(self, chunk: TerrainChunk) -> List[Tuple[int, int]]:
+        # only cells whose tile has moved on to another frame since the chunk last drew it are redrawn, the static backdrop is left alone
+        start_x = chunk.chunk_x * self.chunk_size
+        start_y = chunk.chunk_y * self.chunk_size
+        redrawn_cells = []
+
+        blit_sequence = []
+        for tile, cells in chunk.animated_cells.items():
+            current_frame = tile.get_current_frame()
+            if chunk.baked_frames[tile] != current_frame:
+                image = tile.rendered_images[current_frame]
+                for x, y in cells:
+                    blit_sequence.append((image, ((x - start_x) * self.zoom_level, (y - start_y) * self.zoom_level), tile.rendered_areas[self.grid.connection_masks[x, y]]))
+                redrawn_cells.extend(cells)
+                chunk.baked_frames[tile] = current_frame
+        chunk.surface.blits(blit_sequence, doreturn=False)
+
+        return redrawn_cells
+
+    def get_visible_chunk_range(self, camera: Camera) -> Tuple[int, int, int, int]:
+        chunk_columns = int((self.grid.width + self.chunk_size - 1) / self.chunk_size)
+        chunk_rows = int((self.grid.height + self.chunk_size - 1) / self.chunk_size)
+        return camera.get_visible_range(self.chunk_size, chunk_columns, chunk_rows)
+
+    def update(self, camera: Camera, build_missing: bool = True) -> List[pygame.Rect]:
+        # brings the visible chunks up to date ahead of rendering and returns the screen areas that changed
+        # without build_missing chunks not built yet are skipped, left for build_visible_chunks_in_steps to fill in
+        if camera.zoom_level != self.zoom_level:
+            self.invalidate_all()
+            self.zoom_level = camera.zoom_level
+
+        changed_rects = []
+        start_chunk_x, end_chunk_x, start_chunk_y, end_chunk_y = self.get_visible_chunk_range(camera)
+        for chunk_x in range(start_chunk_x, end_chunk_x):
+            for chunk_y in range(start_chunk_y, end_chunk_y):
+                if not build_missing and (chunk_x, chunk_y) not in self.chunks.keys():
+                    continue
+                redrawn_cells = self.redraw_animated_cells(self.get_chunk(chunk_x, chunk_y))
+                if len(redrawn_cells) > 0:
+                    start_x = min([x for x, y in redrawn_cells])
+                    start_y = min([y for x, y in redrawn_cells])
+                    end_x = max([x for x, y in redrawn_cells]) + 1
+                    end_y = max([y for x, y in redrawn_cells]) + 1
+                    screen_x, screen_y = camera.world_to_screen(start_x, start_y)
+                    changed_rects.append(pygame.Rect(screen_x, screen_y, (end_x - start_x) * camera.zoom_level, (end_y - start_y) * camera.zoom_level))
+
+        return changed_rects
+
+    def render(self, camera: Camera, surface, build_missing: bool = True):
+        self.update(camera, build_missing)
+
+        start_chunk_x, end_chunk_x, start_chunk_y, end_chunk_y = self.get_visible_chunk_range(camera)
+        blit_sequence = []
+        for chunk_x in range(start_chunk_x, end_chunk_x):
+            for chunk_y in range(start_chunk_y, end_chunk_y):
+                if not build_missing and (chunk_x, chunk_y) not in self.chunks.keys():
+                    continue
+                chunk = self.get_chunk(chunk_x, chunk_y)
+                blit_sequence.append((chunk.surface, camera.world_to_screen(chunk_x * self.chunk_size, chunk_y * self.chunk_size)))
+        surface.blits(blit_sequence, doreturn=False)
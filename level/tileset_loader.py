@@ -1,11 +1,13 @@
 import json
-import pygame
+import math
+import numpy as np
 
 from typing import List, Dict, Tuple
 from level.tile_type_enum import TileTypeEnum, TileFormatEnum, DecoratorEnum, DecoratorCollisionFormatEnum
 from registries.image_registry import ImageRegistery
 from registries.collision_registry import CollisionObject, CollisionRect, CollisionSphere
 from registries.event_registry import EventRegistry, Event, EventTypeEnum
+from level.scaled_image_cache import ScaledImageCache
 
 class DecoratorType():
 
@@ -25,35 +27,47 @@ class DecoratorType():
         self.rendered_images = []
         self.collision_objects = collision_objects
 
-    def update_renders(self, zoom_level: float):
+    def update_renders(self, zoom_level: float, image_cache: ScaledImageCache):
         self.rendered_images = []
         for image in self.images:
             self.rendered_images.append(
-                pygame.transform.scale(image, (int(self.width/40 * zoom_level), int(self.height/40 * zoom_level)))
+                image_cache.get_scaled_image(image, (int(self.width/40 * zoom_level), int(self.height/40 * zoom_level)))
             )
 
+        self.rendered_width = self.width/40*zoom_level
+        self.rendered_height = self.height/40*zoom_level
+        self.x_offset = 0
+        self.y_offset = 0
+        if self.center:
+            x_offset_tiles, y_offset_tiles = self.get_center_offset_in_tiles()
+            self.x_offset = x_offset_tiles*zoom_level
+            self.y_offset = y_offset_tiles*zoom_level
+
+    def get_center_offset_in_tiles(self) -> Tuple[float, float]:
+        if self.width/40 %2 == 0:
+            x_offset = self.width/40/2
+        else:
+            x_offset = (self.width/40 - 1)/2
+        if self.height/40 %2 == 0:
+            y_offset = self.height/40/2
+        else:
+            y_offset = (self.height/40 - 1)/2
+        return x_offset, y_offset
+
+    def get_tile_extent(self) -> int:
+        return math.ceil(max(self.width, self.height)/40)
+
     def render(self, x_pos: float, y_pos: float, zoom_level: float, surface):
 
         surface_width, surface_height = surface.get_size()
 
-        image_to_render = self.rendered_images[int(self.current_animation_time)]
-        if self.center:
-            x_offset = 0
-            y_offset = 0
-            if self.width/40 %2 == 0:
-                x_offset = self.width/40/2*zoom_level
-            else:
-                x_offset = (self.width/40 - 1)/2*zoom_level
-            if self.height/40 %2 == 0:
-                y_offset = self.height/40/2*zoom_level
-            else:
-                y_offset = (self.height/40 - 1)/2*zoom_level
-            if  (x_pos - x_offset) + self.width/40*zoom_level > 0 and (x_pos - x_offset) < surface_width and\
-                 (y_pos - y_offset) + self.height/40*zoom_level > 0 and (y_pos - y_offset) < surface_height:
-                surface.blit(image_to_render, (x_pos - x_offset, y_pos - y_offset))
-        else:
+        if  (x_pos - self.x_offset) + self.rendered_width > 0 and (x_pos - self.x_offset) < surface_width and\
+             (y_pos - self.y_offset) + self.rendered_height > 0 and (y_pos - self.y_offset) < surface_height:
+            surface.blit(*self.get_blit(x_pos, y_pos))
 
-            surface.blit(image_to_render, (x_pos, y_pos))
+    def get_blit(self, x_pos: float, y_pos: float) -> Tuple:
+        # the (source, dest) pair for a Surface.blits list, anything off the surface is clipped by blits itself
+        return self.rendered_images[int(self.current_animation_time)], (x_pos - self.x_offset, y_pos - self.y_offset)
 
     def get_collision_objects(self) -> List[CollisionObject]:
         return self.collision_objects
@@ -119,9 +133,14 @@ class TileType():
         ([False, True, True, False, True, True, True, False, False], 0, 120, 40, 40)
     ]
 
+    # (x, y) offsets of the eight neighbours, in surroundings order with the centre skipped. bit n of a connection mask is neighbour n.
+    connection_mask_offsets = [(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+    connection_mask_lookup = []
+
     def __init__(self, images: List, animation_speed: float, format_in: TileFormatEnum, tile_type: TileTypeEnum, allowed_connections: List[TileTypeEnum]):
         self.images = []
         self.rendered_images = []
+        self.rendered_areas = []
         self.rendered_grids = []
         for image in images:
             self.images.append(
@@ -138,16 +157,37 @@ class TileType():
     def is_tile_type_allowed_for_connection(self, tile_type: TileTypeEnum) -> bool:
         return tile_type in self.allowed_connections
 
+    def is_animated(self) -> bool:
+        return len(self.images) > 1 and self.animation_speed > 0
+
+
+    def get_current_frame(self) -> int:
+        return int(self.current_animation_time)
 
     def update(self, delta: float):
-        previous_frame = int(str(self.current_animation_time).split(".")[0])
         self.current_animation_time = self.current_animation_time + self.animation_speed * delta
 
         if self.current_animation_time >= len(self.images):
             self.current_animation_time = 0.0
 
 
-    def get_image_positionals_for_surroundings(self, surroundings: List):
+    @staticmethod
+    def get_surroundings_for_connection_mask(connection_mask: int) -> List[bool]:
+        surroundings = [bool(connection_mask & (1 << bit)) for bit in range(0, 8)]
+        surroundings.insert(4, True)
+        return surroundings
+
+    @staticmethod
+    def build_connection_mask_lookup():
+        TileType.connection_mask_lookup = []
+        for connection_mask in range(0, 256):
+            TileType.connection_mask_lookup.append(
+                TileType.get_image_positionals_for_surroundings(TileType.get_surroundings_for_connection_mask(connection_mask))
+            )
+
+    @staticmethod
+    def get_image_positionals_for_surroundings(surroundings: List):
+        surroundings = list(surroundings)
         for section in TileType.complex_format_image_definitions:
             if surroundings == section[0]:
                 return (section[1], section[2], section[3], section[4])
@@ -163,28 +203,32 @@ class TileType():
 
         return (160, 320, 40, 40)
 
-    def update_renders(self, zoom_level: float):
+    def update_renders(self, zoom_level: float, image_cache: ScaledImageCache):
+        self.rendered_images = []
         for image in self.images:
             if self.format == TileFormatEnum.CONNECTABLE:
-                rendered_image = pygame.transform.scale(image, (zoom_level * 5, zoom_level * 9))
+                rendered_image = image_cache.get_scaled_image(image, (zoom_level * 5, zoom_level * 9))
             else:
-                rendered_image = pygame.transform.scale(image, (zoom_level, zoom_level))
+                rendered_image = image_cache.get_scaled_image(image, (zoom_level, zoom_level))
             self.rendered_images.append(rendered_image)
 
-
-    def render(self, x_pos: float, y_pos: float, width: float, height: float, surface, surroundings: List):
+        # the part of the image to draw for each connection mask, already scaled, so callers can build blit lists without any sums per tile
         if self.format == TileFormatEnum.CONNECTABLE:
-            positionals = self.get_image_positionals_for_surroundings(surroundings)
-            surface.blit(self.rendered_images[int(str(self.current_animation_time).split(".")[0])], (x_pos, y_pos), (positionals[0]/40*width, positionals[1]/40*width, width, height))
+            self.rendered_areas = [(positionals[0]/40*zoom_level, positionals[1]/40*zoom_level, zoom_level, zoom_level) for positionals in TileType.connection_mask_lookup]
         else:
-            surface.blit(self.rendered_images[int(str(self.current_animation_time).split(".")[0])], (x_pos, y_pos))
+            self.rendered_areas = [None] * len(TileType.connection_mask_lookup)
+
+
+    def render(self, x_pos: float, y_pos: float, width: float, height: float, surface, connection_mask: int):
+        surface.blit(self.rendered_images[self.get_current_frame()], (x_pos, y_pos), self.rendered_areas[connection_mask])
 
 
 class TileSet():
 
-    def __init__(self, tiles: List[TileType], decorators: List[DecoratorType]):
+    def __init__(self, tiles: List[TileType], decorators: List[DecoratorType], image_cache_budget: int = 64 * 1024 * 1024):
 
         identified_types = []
+        self.image_cache = ScaledImageCache(image_cache_budget)
 
         self.__tiles = {}
         self.__decorators = {}
@@ -203,18 +247,40 @@ class TileSet():
                 identified_types.append(decorator)
                 self.__decorators[decorator.decorator_type] = decorator
 
+        TileType.build_connection_mask_lookup()
+
 
     def get_tile_for_type(self, tile_type: TileTypeEnum) -> TileType:
         return self.__tiles[tile_type]
 
+    def has_tile_for_type(self, tile_type: TileTypeEnum) -> bool:
+        return tile_type in self.__tiles.keys()
+
+    def get_connection_matrix(self) -> np.ndarray:
+        # rows and columns follow TileTypeEnum order, the extra last column stands in for cells beyond the grid edge
+        tile_types = list(TileTypeEnum)
+        connection_matrix = np.zeros((len(tile_types), len(tile_types) + 1), dtype=bool)
+        connection_matrix[:, len(tile_types)] = True
+        for row, tile_type in enumerate(tile_types):
+            if tile_type in self.__tiles.keys():
+                for column, connection_type in enumerate(tile_types):
+                    connection_matrix[row, column] = self.__tiles[tile_type].is_tile_type_allowed_for_connection(connection_type)
+        return connection_matrix
+
     def get_decorator_for_type(self, decorator_type: DecoratorType):
         return self.__decorators[decorator_type]
 
+    def get_largest_decorator_tile_extent(self) -> int:
+        largest_extent = 0
+        for decorator in self.__decorators.values():
+            largest_extent = max(largest_extent, decorator.get_tile_extent())
+        return largest_extent
+
     def update_renders(self, zoom_level: int):
         for decorator in self.__decorators.values():
-            decorator.update_renders(zoom_level)
+            decorator.update_renders(zoom_level, self.image_cache)
         for tile in self.__tiles.values():
-            tile.update_renders(zoom_level)
+            tile.update_renders(zoom_level, self.image_cache)
 
     def update_animations(self, delta: float):
         for tile in self.__tiles.values():
@@ -222,7 +288,7 @@ class TileSet():
 
 
 
-def load_tileset(tileset_filename: str) -> TileSet:
+def load_tileset(tileset_filename: str, image_cache_budget: int = 64 * 1024 * 1024) -> TileSet:
 
     with open("media/tileset_data/" + tileset_filename) as tileset_file:
         tileset_data = json.loads(tileset_file.read())
@@ -286,5 +352,5 @@ def load_tileset(tileset_filename: str) -> TileSet:
                 )
             )
 
-        return TileSet(identified_tiles, identified_decorators)
+        return TileSet(identified_tiles, identified_decorators, image_cache_budget)
         
\ No newline at end of file
@@ -1,5 +1,7 @@
 # Import and initialize the pygame library
 import pygame
+import sys
+import gc
 from datetime import datetime
 pygame.init()
 
@@ -11,60 +13,106 @@ from interface.keyboard import KeyBoard
 from state.game_state import GameState
 from state.state_enum import StateEnum
 from level.grid import Grid
+from level.chunked_grid import ChunkedGrid
+from level.level_pool import LevelPool
+from level.tileset_loader import TileSet
 from ui_components.ui_text import UIText
 from registries.event_registry import EventRegistry
+from registries.dirty_rect_registry import DirtyRectRegistry
 
 class Game():
 
-    main_menu = MainMenu()
-    gamplay = GameplayUI()
-    pause_menu = PauseMenu()
-    KeyBoard()
-    my_grid = Grid(300,200,"test_tileset.json")
-
-    fps_text = UIText(10,10, "fps: ", 30, False, (0,0,0))
-    
-    def __init__(self):
+    def __init__(self, dirty_rect_mode: bool = False, level_cache_mode: bool = False, chunked_world_mode: bool = False):
 
         info = pygame.display.Info()
+        DirtyRectRegistry.enabled = dirty_rect_mode
 
         self.game_objects = []
         #self.screen = pygame.display.set_mode([info.current_w, info.current_h], pygame.NOFRAME)
         self.screen = pygame.display.set_mode([1200, 800])
+
+        self.main_menu = MainMenu()
+        self.gamplay = GameplayUI()
+        self.pause_menu = PauseMenu()
+        KeyBoard()
+
+        # everything made so far lives as long as the game, freezing it keeps full collections from walking it every time
+        # levels are made after this point, so the ones swapped out can still be collected
+        gc.freeze()
+
+        self.chunked_world_mode = chunked_world_mode
+        if chunked_world_mode:
+            # an endless world streamed in chunks around the camera, edits are kept in world_chunks as chunks are evicted
+            self.my_grid = ChunkedGrid("test_tileset.json", chunk_directory = "world_chunks")
+        else:
+            self.my_grid = Grid(300,200,"test_tileset.json")
+
+        self.fps_text = UIText(10,10, "fps: ", 30, False, (0,0,0))
+        # upcoming levels are generated in worker processes so the current one keeps running until the next is needed
+        # a chunked world streams its own chunks, so it has no pool and enter starts a world from a new seed instead
+        self.level_pool = None
+        if not chunked_world_mode:
+            self.level_pool = LevelPool(300, 200, "test_tileset.json", cache_directory = "level_cache" if level_cache_mode else None)
+        self.level_requested = False
+        self.generation_text = UIText(10,40, "", 30, False, (0,0,0))
+        self.next_grid = None
+        self.grid_loading_budget = 0.004
         
 
     def render(self):
 
+        screen_width, screen_height = self.screen.get_size()
+        full_redraw = DirtyRectRegistry.requires_full_redraw(screen_width, screen_height)
+        dirty_rects = DirtyRectRegistry.get_dirty_rects()
+        DirtyRectRegistry.reset()
+
+        if full_redraw:
+            self.screen.set_clip(None)
+        elif len(dirty_rects) == 0:
+            return
+        else:
+            # only the dirty area is redrawn, everything outside the clip is left as it was last frame
+            self.screen.set_clip(dirty_rects[0].unionall(dirty_rects[1:]))
+
         self.screen.fill((10, 10, 120))
 
-        Game.my_grid.render(self.screen)
+        self.my_grid.render(self.screen)
 
         if GameState.state == StateEnum.MAINMENU:
-            Game.main_menu.render(self.screen)
+            self.main_menu.render(self.screen)
         elif GameState.state == StateEnum.GAMEPLAY:
-            Game.gamplay.render(self.screen)
+            self.gamplay.render(self.screen)
         elif GameState.state == StateEnum.PAUSED:
-            Game.pause_menu.render(self.screen)
+            self.pause_menu.render(self.screen)
 
 
-        Game.fps_text.render(self.screen)
+        self.fps_text.render(self.screen)
+        if self.is_loading_level():
+            self.generation_text.render(self.screen)
         
 
         # Flip the display
-        pygame.display.flip()
+        if full_redraw:
+            pygame.display.flip()
+        else:
+            self.screen.set_clip(None)
+            pygame.display.update(dirty_rects)
 
     def main_loop(self):
         # Run until the user asks to quit
         running = True
         mouse = get_mouse(None)
         previous_time = datetime.now()
+        previous_state = None
 
         while running:
             current_time = datetime.now()
             delta = (current_time - previous_time).total_seconds()
             if delta == 0:
                 delta = 0.001
-            Game.fps_text.text = "FPS: " + str(int(60/delta))
+            previous_fps_text_rect = self.fps_text.get_rect()
+            self.fps_text.text = "FPS: " + str(int(60/delta))
+            DirtyRectRegistry.mark_dirty(previous_fps_text_rect.union(self.fps_text.get_rect()))
 
             EventRegistry.process_subscriptions(delta)
 
@@ -77,25 +125,78 @@ class Game():
             KeyBoard.update()
 
             if GameState.state == StateEnum.MAINMENU:
-                Game.main_menu.update(mouse)
+                self.main_menu.update(mouse)
             elif GameState.state == StateEnum.GAMEPLAY:
-                Game.gamplay.update(mouse)
+                self.gamplay.update(mouse)
             elif GameState.state == StateEnum.PAUSED:
-                Game.pause_menu.update(mouse)
+                self.pause_menu.update(mouse)
 
-            Game.my_grid.update(mouse, delta)
+            self.my_grid.update(mouse, delta)
 
             if KeyBoard.get_key_state(pygame.K_RETURN).is_pressed and KeyBoard.get_key_state(pygame.K_RETURN).has_pressed_state_changed:
-                Game.my_grid = Grid(300,200,"test_tileset.json")
+                if not self.is_loading_level():
+                    self.level_requested = True
+
+            self.update_level_generation()
+
+            if GameState.state != previous_state:
+                DirtyRectRegistry.mark_full_redraw()
+                previous_state = GameState.state
 
             EventRegistry.purge_events()
             self.render()
 
             previous_time = current_time
         # Done! Time to quit.
+        if self.level_pool is not None:
+            self.level_pool.shutdown()
         pygame.quit()
 
-
-
-game = Game()
-game.main_loop()
\ No newline at end of file
+    def is_loading_level(self) -> bool:
+        return self.level_requested or self.next_grid is not None
+
+    def get_shared_tileset(self, tileset_filename: str) -> TileSet:
+        # a level from the same tileset file takes over the current one's TileSet, so its scaled image cache stays warm across swaps
+        if self.my_grid.tileset_filename == tileset_filename:
+            return self.my_grid.tileset
+        return None
+
+    def update_level_generation(self):
+        if self.level_pool is not None:
+            self.level_pool.update()
+        if not self.is_loading_level():
+            return
+
+        previous_generation_text_rect = self.generation_text.get_rect()
+
+        if self.level_requested and self.chunked_world_mode:
+            # nothing is generated up front, the chunks around the camera are built as the new world loads
+            self.level_requested = False
+            self.next_grid = ChunkedGrid("test_tileset.json", chunk_directory = "world_chunks", incremental = True, tileset = self.get_shared_tileset("test_tileset.json"))
+            self.next_grid.camera.set_screen_size(*self.screen.get_size())
+        elif self.level_requested and self.level_pool.has_ready_level():
+            level_data = self.level_pool.pop()
+            self.level_requested = False
+            tileset_filename = level_data.metadata["tileset_filename"]
+            self.next_grid = Grid(level_data.width, level_data.height, tileset_filename, level_data, incremental = True, tileset = self.get_shared_tileset(tileset_filename))
+            self.next_grid.camera.set_screen_size(*self.screen.get_size())
+
+        if self.next_grid is None:
+            progress, stage = self.level_pool.get_next_level_progress()
+            self.generation_text.text = "generating level: " + str(int(progress * 100)) + "% " + stage
+        else:
+            self.generation_text.text = "generating level: 100% loading"
+
+            # the finished level is built into a grid a few milliseconds per frame and swapped in once it is complete
+            if self.next_grid.continue_loading(self.grid_loading_budget):
+                self.next_grid.activate()
+                self.my_grid = self.next_grid
+                self.next_grid = None
+                DirtyRectRegistry.mark_full_redraw()
+
+        DirtyRectRegistry.mark_dirty(previous_generation_text_rect.union(self.generation_text.get_rect()))
+
+
+if __name__ == "__main__":
+    game = Game(dirty_rect_mode = "--dirty-rects" in sys.argv, level_cache_mode = "--level-cache" in sys.argv, chunked_world_mode = "--chunked-world" in sys.argv)
+    game.main_loop()
\ No newline at end of file
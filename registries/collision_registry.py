@@ -1,5 +1,7 @@
-from typing import Dict, List
+import math
+from typing import Dict, List, Tuple
 from uuid import uuid4
+import numpy as np
 import pygame
 
 class CollisionObject():
@@ -45,6 +47,97 @@ class Collidable():
     def get_collision_object() -> CollisionObject:
         raise NotImplementedError("get_collision_object must be implemented")
 
+class CollisionOverlay():
+
+    colour = (255, 255, 0, 128)
+
+    def __init__(self, registry: 'CollisionRegistry', chunk_size: int = 32):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be a whole number more than 0. provided: " + str(chunk_size))
+
+        self.registry = registry
+        self.chunk_size = chunk_size
+        self.zoom_level = None
+        self.registry_version = None
+        self.chunk_objects: Dict[Tuple[int, int], List[CollisionObject]] = {}
+        self.chunk_surfaces: Dict[Tuple[int, int], pygame.Surface] = {}
+
+    def get_object_bounds(self, collision_object: CollisionObject) -> Tuple[float, float, float, float]:
+        if isinstance(collision_object, CollisionSphere):
+            return collision_object.x_pos - collision_object.radius, collision_object.y_pos - collision_object.radius, collision_object.radius * 2, collision_object.radius * 2
+        return collision_object.x_pos, collision_object.y_pos, collision_object.width, collision_object.height
+
+    def sort_objects_into_chunks(self):
+        self.chunk_objects = {}
+        self.chunk_surfaces = {}
+        for collision_objects in self.registry.collision_objects.values():
+            for collision_object in collision_objects:
+                x_pos, y_pos, width, height = self.get_object_bounds(collision_object)
+                for chunk_x in range(math.floor(x_pos / self.chunk_size), math.floor((x_pos + width) / self.chunk_size) + 1):
+                    for chunk_y in range(math.floor(y_pos / self.chunk_size), math.floor((y_pos + height) / self.chunk_size) + 1):
+                        if (chunk_x, chunk_y) not in self.chunk_objects.keys():
+                            self.chunk_objects[(chunk_x, chunk_y)] = []
+                        self.chunk_objects[(chunk_x, chunk_y)].append(collision_object)
+
+        collision_grid = self.registry.collision_grid
+        for chunk_x in range(math.floor(self.registry.origin_x / self.chunk_size), math.ceil((self.registry.origin_x + collision_grid.shape[0]) / self.chunk_size)):
+            for chunk_y in range(math.floor(self.registry.origin_y / self.chunk_size), math.ceil((self.registry.origin_y + collision_grid.shape[1]) / self.chunk_size)):
+                if (chunk_x, chunk_y) not in self.chunk_objects.keys() and self.registry.any_solid_in_rect(chunk_x * self.chunk_size, chunk_y * self.chunk_size, self.chunk_size, self.chunk_size):
+                    self.chunk_objects[(chunk_x, chunk_y)] = []
+        self.registry_version = self.registry.version
+
+    def build_chunk_surface(self, chunk_x: int, chunk_y: int) -> pygame.Surface:
+        chunk_pixel_size = self.chunk_size * self.zoom_level
+        surface = pygame.Surface((chunk_pixel_size, chunk_pixel_size), pygame.SRCALPHA)
+        # objects are drawn relative to the chunk origin, anything reaching into a neighbouring chunk is clipped here and drawn there too
+        origin_x = chunk_x * self.chunk_size
+        origin_y = chunk_y * self.chunk_size
+
+        # the registered grid may start anywhere in the world and cover only part of this chunk
+        grid_x = origin_x - self.registry.origin_x
+        grid_y = origin_y - self.registry.origin_y
+        start_x = max(0, grid_x)
+        start_y = max(0, grid_y)
+        chunk_collision_grid = self.registry.collision_grid[start_x:max(start_x, grid_x + self.chunk_size), start_y:max(start_y, grid_y + self.chunk_size)]
+        if chunk_collision_grid.any():
+            # the solid cells are painted one pixel per tile and then scaled up, which keeps the cost per chunk rather than per cell
+            cell_surface = pygame.Surface(chunk_collision_grid.shape, pygame.SRCALPHA)
+            cell_surface.fill(CollisionOverlay.colour[:3] + (0,))
+            cell_alpha = pygame.surfarray.pixels_alpha(cell_surface)
+            cell_alpha[chunk_collision_grid] = CollisionOverlay.colour[3]
+            del cell_alpha
+            surface.blit(pygame.transform.scale(cell_surface, (chunk_collision_grid.shape[0] * self.zoom_level, chunk_collision_grid.shape[1] * self.zoom_level)), ((start_x - grid_x) * self.zoom_level, (start_y - grid_y) * self.zoom_level))
+
+        for collision_object in self.chunk_objects[(chunk_x, chunk_y)]:
+            if isinstance(collision_object, CollisionSphere):
+                pygame.draw.circle(surface, CollisionOverlay.colour, ((collision_object.x_pos - origin_x) * self.zoom_level, (collision_object.y_pos - origin_y) * self.zoom_level), collision_object.radius * self.zoom_level)
+            else:
+                pygame.draw.rect(surface, CollisionOverlay.colour, ((collision_object.x_pos - origin_x) * self.zoom_level, (collision_object.y_pos - origin_y) * self.zoom_level, collision_object.width * self.zoom_level, collision_object.height * self.zoom_level))
+
+        return surface
+
+    def render(self, camera: 'Camera', surface):
+        if camera.zoom_level != self.zoom_level:
+            self.chunk_surfaces = {}
+            self.zoom_level = camera.zoom_level
+        if self.registry.version != self.registry_version:
+            self.sort_objects_into_chunks()
+
+        chunk_pixel_size = self.chunk_size * camera.zoom_level
+        start_chunk_x = math.floor(camera.x_pos / chunk_pixel_size)
+        end_chunk_x = math.floor((camera.x_pos + camera.screen_width) / chunk_pixel_size) + 1
+        start_chunk_y = math.floor(camera.y_pos / chunk_pixel_size)
+        end_chunk_y = math.floor((camera.y_pos + camera.screen_height) / chunk_pixel_size) + 1
+
+        blit_sequence = []
+        for chunk_x in range(start_chunk_x, end_chunk_x):
+            for chunk_y in range(start_chunk_y, end_chunk_y):
+                if (chunk_x, chunk_y) in self.chunk_objects.keys():
+                    if (chunk_x, chunk_y) not in self.chunk_surfaces.keys():
+                        self.chunk_surfaces[(chunk_x, chunk_y)] = self.build_chunk_surface(chunk_x, chunk_y)
+                    blit_sequence.append((self.chunk_surfaces[(chunk_x, chunk_y)], camera.world_to_screen(chunk_x * self.chunk_size, chunk_y * self.chunk_size)))
+        surface.blits(blit_sequence, doreturn=False)
+
 class CollisionRegistry():
 
     current_instance = None
@@ -61,25 +154,85 @@ class CollisionRegistry():
 
     def __init__(self):
         self.collision_objects = {}
-
-    def register_grid(self, collision_grid: Dict):
-        grid_uuid = str(uuid4())
-        print(len(collision_grid.keys()))
-        for x in range(collision_grid["width"]):
-            for y in range(collision_grid["height"]):
-                if collision_grid[x][y] == 1:
-                    self.collision_objects[grid_uuid] = [CollisionRect(x, y, 1, 1)]
+        self.collision_grid = np.zeros((0, 0), dtype=bool)
+        self.origin_x = 0
+        self.origin_y = 0
+        self.solid_counts = np.zeros((1, 1), dtype=np.int32)
+        self.version = 0
+        self.overlay = CollisionOverlay(self)
+
+    def register_grid(self, collision_grid: np.ndarray, origin_x: int = 0, origin_y: int = 0):
+        # origin is the world tile the first cell of the grid sits on, a streamed world registers only the part of it that is loaded
+        self.collision_grid = np.asarray(collision_grid, dtype=bool)
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+        # summed area table, solid_counts[x, y] is the number of solid cells above and to the left of (x, y)
+        self.solid_counts = np.zeros((self.collision_grid.shape[0] + 1, self.collision_grid.shape[1] + 1), dtype=np.int32)
+        self.solid_counts[1:, 1:] = self.collision_grid.cumsum(axis=0, dtype=np.int32).cumsum(axis=1, dtype=np.int32)
+        self.version = self.version + 1
 
     
-    def register_decorators(self, decorations: List['Decoration']):
+    def register_decorators(self, decorations: List['Decoration'], x_offset: float = 0, y_offset: float = 0):
+        # offsets move decorations placed relative to a chunk to their position in the world
         for decoration in decorations:
             if decoration.out_of_bounds == False:
-                self.collision_objects[decoration.id] = decoration.get_collision_objects()
-
-    def render(self, zoom_level: int, surface):
-        for collision_objects in self.collision_objects.values():
-            for collision_object in collision_objects:
-                if isinstance(collision_object, CollisionRect):
-                    pygame.draw.rect(surface, (255,255,0), (collision_object.x_pos * zoom_level, collision_object.y_pos * zoom_level, collision_object.width * zoom_level, collision_object.height * zoom_level))
-                elif isinstance(collision_object, CollisionSphere):
-                    pygame.draw.circle(surface, (255,255,0), (collision_object.x_pos * zoom_level, collision_object.y_pos * zoom_level), collision_object.radius * zoom_level)
+                collision_objects = decoration.get_collision_objects()
+                for collision_object in collision_objects:
+                    collision_object.x_pos = collision_object.x_pos + x_offset
+                    collision_object.y_pos = collision_object.y_pos + y_offset
+                self.collision_objects[decoration.id] = collision_objects
+        self.version = self.version + 1
+
+    def unregister_decorators(self, decorations: List['Decoration']):
+        for decoration in decorations:
+            self.collision_objects.pop(decoration.id, None)
+        self.version = self.version + 1
+
+    # grid queries work in tile units, anything outside the registered grid counts as solid
+    def is_solid(self, x_pos: float, y_pos: float) -> bool:
+        x = math.floor(x_pos) - self.origin_x
+        y = math.floor(y_pos) - self.origin_y
+        if x < 0 or y < 0 or x >= self.collision_grid.shape[0] or y >= self.collision_grid.shape[1]:
+            return True
+        return bool(self.collision_grid[x, y])
+
+    def are_solid(self, x_positions: np.ndarray, y_positions: np.ndarray) -> np.ndarray:
+        x_cells = np.floor(np.asarray(x_positions, dtype=float)).astype(np.intp) - self.origin_x
+        y_cells = np.floor(np.asarray(y_positions, dtype=float)).astype(np.intp) - self.origin_y
+        inside = (x_cells >= 0) & (y_cells >= 0) & (x_cells < self.collision_grid.shape[0]) & (y_cells < self.collision_grid.shape[1])
+
+        solid = np.ones(x_cells.shape, dtype=bool)
+        solid[inside] = self.collision_grid[x_cells[inside], y_cells[inside]]
+        return solid
+
+    def any_solid_in_rect(self, x_pos: float, y_pos: float, width: float, height: float) -> bool:
+        x_pos = x_pos - self.origin_x
+        y_pos = y_pos - self.origin_y
+        start_x = math.floor(x_pos)
+        start_y = math.floor(y_pos)
+        end_x = max(start_x + 1, math.ceil(x_pos + width))
+        end_y = max(start_y + 1, math.ceil(y_pos + height))
+        if start_x < 0 or start_y < 0 or end_x > self.collision_grid.shape[0] or end_y > self.collision_grid.shape[1]:
+            return True
+
+        solid_count = self.solid_counts[end_x, end_y] - self.solid_counts[start_x, end_y] - self.solid_counts[end_x, start_y] + self.solid_counts[start_x, start_y]
+        return bool(solid_count > 0)
+
+    def any_solid_in_rects(self, x_positions: np.ndarray, y_positions: np.ndarray, widths: np.ndarray, heights: np.ndarray) -> np.ndarray:
+        x_positions = np.asarray(x_positions, dtype=float) - self.origin_x
+        y_positions = np.asarray(y_positions, dtype=float) - self.origin_y
+        start_x = np.floor(x_positions).astype(np.intp)
+        start_y = np.floor(y_positions).astype(np.intp)
+        end_x = np.maximum(start_x + 1, np.ceil(x_positions + widths).astype(np.intp))
+        end_y = np.maximum(start_y + 1, np.ceil(y_positions + heights).astype(np.intp))
+        inside = (start_x >= 0) & (start_y >= 0) & (end_x <= self.collision_grid.shape[0]) & (end_y <= self.collision_grid.shape[1])
+
+        start_x, start_y, end_x, end_y = start_x[inside], start_y[inside], end_x[inside], end_y[inside]
+        solid_counts = self.solid_counts[end_x, end_y] - self.solid_counts[start_x, end_y] - self.solid_counts[end_x, start_y] + self.solid_counts[start_x, start_y]
+
+        solid = np.ones(x_positions.shape, dtype=bool)
+        solid[inside] = solid_counts > 0
+        return solid
+
+    def render(self, camera: 'Camera', surface):
+        self.overlay.render(camera, surface)
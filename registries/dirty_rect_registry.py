@@ -0,0 +1,37 @@
+import pygame
+from typing import List, Tuple
+
+class DirtyRectRegistry():
+
+    enabled = False
+    full_redraw = True
+    dirty_rects: List[pygame.Rect] = []
+    # once the dirty rects cover more than this share of the screen a full flip is cheaper than tracking them
+    full_redraw_threshold = 0.5
+
+    @staticmethod
+    def mark_dirty(rect: Tuple[float, float, float, float]):
+        DirtyRectRegistry.dirty_rects.append(pygame.Rect(rect))
+
+    @staticmethod
+    def mark_full_redraw():
+        DirtyRectRegistry.full_redraw = True
+
+    @staticmethod
+    def requires_full_redraw(screen_width: int, screen_height: int) -> bool:
+        if not DirtyRectRegistry.enabled or DirtyRectRegistry.full_redraw:
+            return True
+
+        dirty_area = 0
+        for rect in DirtyRectRegistry.dirty_rects:
+            dirty_area = dirty_area + rect.width * rect.height
+        return dirty_area > screen_width * screen_height * DirtyRectRegistry.full_redraw_threshold
+
+    @staticmethod
+    def get_dirty_rects() -> List[pygame.Rect]:
+        return DirtyRectRegistry.dirty_rects
+
+    @staticmethod
+    def reset():
+        DirtyRectRegistry.full_redraw = False
+        DirtyRectRegistry.dirty_rects = []
@@ -0,0 +1,23 @@
+import os
+import sys
+import pytest
+
+# tests import the game packages from the repository root and load tilesets through paths relative to it
+repository_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repository_root)
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+
+@pytest.fixture(scope="session")
+def tileset():
+    import pygame
+    from level.tileset_loader import load_tileset
+
+    # tile images are converted for the display, so a small hidden one is opened first
+    previous_directory = os.getcwd()
+    os.chdir(repository_root)
+    pygame.init()
+    pygame.display.set_mode((64, 64))
+    yield load_tileset("test_tileset.json")
+    pygame.quit()
+    os.chdir(previous_directory)
@@ -0,0 +1,424 @@
+import itertools
+import tracemalloc
+from random import Random
+import numpy as np
+import pytest
+from level.tile_type_enum import TileTypeEnum
+from level.grid_storage import GridStorage
+from level.grid_generator_helper import add_rim_to_tile_type, line_grid_edge, replace_type, scale_grid_up, trim_edges, trim_edges_in_steps, get_grid_regions, find_closest_subset_sum, bridge_gaps, find_bridges_along_first_axis, generate_maze
+
+tile_types = [TileTypeEnum.BLANK, TileTypeEnum.STONE_TILES, TileTypeEnum.BlueTile, TileTypeEnum.RedTile]
+
+
+def make_random_grid(width: int, height: int, seed: int) -> GridStorage:
+    random = np.random.default_rng(seed)
+    indices = np.array([GridStorage.get_index_for_tile_type(tile_type) for tile_type in tile_types], dtype=np.uint8)
+    return GridStorage(width, height, tile_types = indices[random.integers(0, len(indices), (width, height))])
+
+
+def make_grid_from_rows(rows, legend) -> GridStorage:
+    # rows are written as they look on screen, so y runs down the rows and x along each one
+    grid = GridStorage(len(rows[0]), len(rows))
+    for y, row in enumerate(rows):
+        for x, character in enumerate(row):
+            grid.set_tile_type(x, y, legend[character])
+    return grid
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("tile_type_to_replace", [None, TileTypeEnum.BLANK])
+def test_add_rim_to_tile_type_matches_neighbour_loop(seed, tile_type_to_replace):
+    grid = make_random_grid(23, 17, seed)
+    expected = grid.tile_types.copy()
+    for x in range(grid.width):
+        for y in range(grid.height):
+            if grid.get_tile_type(x, y) != TileTypeEnum.STONE_TILES:
+                continue
+            for neighbour_x in range(max(0, x - 1), min(grid.width, x + 2)):
+                for neighbour_y in range(max(0, y - 1), min(grid.height, y + 2)):
+                    if (neighbour_x, neighbour_y) == (x, y):
+                        continue
+                    if tile_type_to_replace is None or grid.get_tile_type(neighbour_x, neighbour_y) == tile_type_to_replace:
+                        expected[neighbour_x, neighbour_y] = GridStorage.get_index_for_tile_type(TileTypeEnum.RedTile)
+
+    add_rim_to_tile_type(grid, TileTypeEnum.STONE_TILES, TileTypeEnum.RedTile, tile_type_to_replace)
+
+    assert np.array_equal(grid.tile_types, expected)
+
+
+def test_line_grid_edge_covers_thickness_on_every_side():
+    grid = make_random_grid(12, 9, 0)
+    expected = grid.tile_types.copy()
+    expected[:2, :] = GridStorage.get_index_for_tile_type(TileTypeEnum.BlueTile)
+    expected[-2:, :] = GridStorage.get_index_for_tile_type(TileTypeEnum.BlueTile)
+    expected[:, :2] = GridStorage.get_index_for_tile_type(TileTypeEnum.BlueTile)
+    expected[:, -2:] = GridStorage.get_index_for_tile_type(TileTypeEnum.BlueTile)
+
+    line_grid_edge(grid, TileTypeEnum.BlueTile, 2)
+
+    assert np.array_equal(grid.tile_types, expected)
+
+
+def test_replace_type_only_changes_the_old_type():
+    grid = make_random_grid(15, 11, 1)
+    original = grid.tile_types.copy()
+
+    replace_type(grid, TileTypeEnum.BlueTile, TileTypeEnum.STONE_TILES)
+
+    was_blue = original == GridStorage.get_index_for_tile_type(TileTypeEnum.BlueTile)
+    assert np.all(grid.tile_types[was_blue] == GridStorage.get_index_for_tile_type(TileTypeEnum.STONE_TILES))
+    assert np.array_equal(grid.tile_types[~was_blue], original[~was_blue])
+
+
+def test_scale_grid_up_repeats_every_cell():
+    grid = make_random_grid(7, 5, 2)
+    collision_grid = np.random.default_rng(2).random((7, 5)) < 0.5
+
+    scaled_grid, scaled_collision_grid = scale_grid_up(grid, collision_grid, 3)
+
+    assert (scaled_grid.width, scaled_grid.height) == (21, 15)
+    for x in range(21):
+        for y in range(15):
+            assert scaled_grid.tile_types[x, y] == grid.tile_types[x // 3, y // 3]
+            assert scaled_collision_grid[x, y] == collision_grid[x // 3, y // 3]
+
+
+def test_scale_grid_up_rejects_multiples_below_one():
+    with pytest.raises(ValueError):
+        scale_grid_up(make_random_grid(4, 4, 0), np.zeros((4, 4), dtype=bool), 0)
+
+
+def trim_edges_by_full_scans(grid: GridStorage, edge_tile_type: TileTypeEnum, replacement_tile_type: TileTypeEnum, minimum_edges: int, pass_through_count: int):
+    # every pass counts the four neighbours of every cell before replacing any of them
+    for i in range(pass_through_count):
+        edges_found = []
+        for x in range(grid.width):
+            for y in range(grid.height):
+                edge_count = 0
+                for neighbour_x, neighbour_y in [(x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)]:
+                    if 0 <= neighbour_x < grid.width and 0 <= neighbour_y < grid.height and grid.get_tile_type(neighbour_x, neighbour_y) == edge_tile_type:
+                        edge_count = edge_count + 1
+                if edge_count <= minimum_edges:
+                    edges_found.append((x, y))
+        for x, y in edges_found:
+            grid.set_tile_type(x, y, replacement_tile_type)
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("minimum_edges, pass_through_count", [(0, 1), (1, 3), (1, 20), (2, 6)])
+def test_trim_edges_matches_full_scans(seed, minimum_edges, pass_through_count):
+    grid = make_random_grid(21, 16, seed)
+    expected = grid.copy()
+    trim_edges_by_full_scans(expected, TileTypeEnum.STONE_TILES, TileTypeEnum.BLANK, minimum_edges, pass_through_count)
+
+    trim_edges(grid, TileTypeEnum.STONE_TILES, TileTypeEnum.BLANK, minimum_edges, pass_through_count)
+
+    assert np.array_equal(grid.tile_types, expected.tile_types)
+
+
+def test_trim_edges_replacing_with_the_edge_type_matches_full_scans():
+    # replacements that are themselves edges change the counts of the cells around them on later passes
+    grid = make_random_grid(19, 14, 7)
+    expected = grid.copy()
+    trim_edges_by_full_scans(expected, TileTypeEnum.STONE_TILES, TileTypeEnum.STONE_TILES, 2, 5)
+
+    trim_edges(grid, TileTypeEnum.STONE_TILES, TileTypeEnum.STONE_TILES, 2, 5)
+
+    assert np.array_equal(grid.tile_types, expected.tile_types)
+
+
+def test_trim_edges_in_steps_yields_between_passes():
+    grid = make_random_grid(21, 16, 3)
+    expected = grid.copy()
+    trim_edges(expected, TileTypeEnum.STONE_TILES, TileTypeEnum.BLANK, 1, 40)
+
+    step_count = len(list(trim_edges_in_steps(grid, TileTypeEnum.STONE_TILES, TileTypeEnum.BLANK, 1, 40, passes_per_step = 1)))
+
+    assert step_count >= 1
+    assert np.array_equal(grid.tile_types, expected.tile_types)
+
+
+def get_regions_by_flood_fill(grid: GridStorage, tile_type: TileTypeEnum):
+    # regions in the order an x-major scan first reaches them, each as a set of (x, y)
+    seen = set()
+    regions = []
+    for x in range(grid.width):
+        for y in range(grid.height):
+            if grid.get_tile_type(x, y) != tile_type or (x, y) in seen:
+                continue
+            seen.add((x, y))
+            region = set()
+            queue = [(x, y)]
+            while len(queue) > 0:
+                check_x, check_y = queue.pop()
+                region.add((check_x, check_y))
+                for neighbour_x, neighbour_y in [(check_x - 1, check_y), (check_x + 1, check_y), (check_x, check_y - 1), (check_x, check_y + 1)]:
+                    if 0 <= neighbour_x < grid.width and 0 <= neighbour_y < grid.height and (neighbour_x, neighbour_y) not in seen and grid.get_tile_type(neighbour_x, neighbour_y) == tile_type:
+                        seen.add((neighbour_x, neighbour_y))
+                        queue.append((neighbour_x, neighbour_y))
+            regions.append(region)
+    return regions
+
+
+def get_region_position_set(region):
+    return set([(position["x"], position["y"]) for position in region.tile_positions])
+
+
+def test_get_grid_regions_on_a_fixed_grid():
+    grid = make_grid_from_rows([
+        "##..#",
+        "#...#",
+        "..#..",
+        ".###.",
+        "#...#",
+    ], {"#": TileTypeEnum.STONE_TILES, ".": TileTypeEnum.BLANK})
+
+    regions = get_grid_regions(grid, TileTypeEnum.STONE_TILES)
+
+    assert [get_region_position_set(region) for region in regions] == [
+        {(0, 0), (1, 0), (0, 1)},
+        {(0, 4)},
+        {(2, 2), (1, 3), (2, 3), (3, 3)},
+        {(4, 0), (4, 1)},
+        {(4, 4)},
+    ]
+    assert [region.size for region in regions] == [3, 1, 4, 2, 1]
+    assert [region.is_region_touching_edge(grid) for region in regions] == [True, True, False, True, True]
+    assert [(region.min_x, region.min_y, region.max_x, region.max_y) for region in regions][2] == (1, 2, 3, 3)
+
+
+def test_get_grid_regions_with_no_matching_tiles():
+    assert get_grid_regions(GridStorage(6, 4), TileTypeEnum.STONE_TILES) == []
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_get_grid_regions_matches_flood_fill(seed):
+    grid = make_random_grid(31, 24, seed)
+    expected = get_regions_by_flood_fill(grid, TileTypeEnum.BLANK)
+
+    regions = get_grid_regions(grid, TileTypeEnum.BLANK)
+
+    assert [get_region_position_set(region) for region in regions] == expected
+    assert [region.size for region in regions] == [len(region) for region in expected]
+    assert [region.is_region_touching_edge(grid) for region in regions] == \
+        [any(x in (0, grid.width - 1) or y in (0, grid.height - 1) for x, y in region) for region in expected]
+
+
+def find_closest_subset_sum_by_brute_force(sizes: np.ndarray, size_goal: int, minimum_count: int, maximum_count: int):
+    # the smallest distance to the goal and the fewest sizes that reach it
+    maximum_count = min(maximum_count, len(sizes))
+    minimum_count = min(minimum_count, maximum_count)
+    best = None
+    for count in range(minimum_count, maximum_count + 1):
+        for indices in itertools.combinations(range(len(sizes)), count):
+            distance = abs(int(sizes[list(indices)].sum()) - size_goal)
+            if best is None or distance < best[0]:
+                best = (distance, count)
+    return best
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_find_closest_subset_sum_matches_brute_force(seed):
+    random = np.random.default_rng(seed)
+    sizes = random.integers(1, 300, random.integers(1, 10)).astype(np.int64)
+    size_goal = int(random.integers(0, 1000))
+    minimum_count = int(random.integers(1, 4))
+    maximum_count = minimum_count + int(random.integers(0, 4))
+    best_distance, best_count = find_closest_subset_sum_by_brute_force(sizes, size_goal, minimum_count, maximum_count)
+
+    chosen_indices = find_closest_subset_sum(sizes, size_goal, minimum_count, maximum_count, 65536)
+
+    assert chosen_indices == sorted(set(chosen_indices))
+    assert abs(int(sizes[chosen_indices].sum()) - size_goal) == best_distance
+    assert len(chosen_indices) == best_count
+
+
+def test_find_closest_subset_sum_scales_sizes_to_fit_the_buckets():
+    # sums far wider than the table are measured in coarser units, so the answer is close rather than exact
+    random = np.random.default_rng(0)
+    sizes = random.integers(1, 5000, 12).astype(np.int64) * 1000
+    best_distance, best_count = find_closest_subset_sum_by_brute_force(sizes, 9000000, 2, 4)
+
+    chosen_indices = find_closest_subset_sum(sizes, 9000000, 2, 4, 1024)
+
+    assert 2 <= len(chosen_indices) <= 4
+    # each size is rounded by at most half a unit of 9000000 * 2 / 1024
+    assert abs(int(sizes[chosen_indices].sum()) - 9000000) <= best_distance + 4 * 9000000 * 2 / 1024
+
+
+def test_find_closest_subset_sum_table_does_not_grow_with_the_sizes():
+    sizes = np.random.default_rng(1).integers(1, 5000000, 3).astype(np.int64)
+
+    tracemalloc.start()
+    find_closest_subset_sum(sizes, 100000000, 2, 5, 65536)
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    assert peak_bytes < 8 * 1024 * 1024
+
+
+def test_find_closest_subset_sum_rejects_bad_counts():
+    with pytest.raises(ValueError):
+        find_closest_subset_sum(np.array([1, 2, 3], dtype=np.int64), 3, 0, 2, 65536)
+    with pytest.raises(ValueError):
+        find_closest_subset_sum(np.array([1, 2, 3], dtype=np.int64), 3, 3, 2, 65536)
+    with pytest.raises(ValueError):
+        find_closest_subset_sum(np.array([1, 2, 3], dtype=np.int64), 3, 1, 2, 0)
+
+
+def find_bridge_by_scanning(gap_mask: np.ndarray, edge_mask: np.ndarray, x: int, y: int, max_bridge_length: int):
+    # walks out from a gap cell along x in both directions, returns the first and last x of the bridge through it or None
+    width, height = gap_mask.shape
+    if not gap_mask[x, y] or not (x - max_bridge_length > 0 and x + max_bridge_length < width - 1 and 1 < y < height - 1):
+        return None
+
+    bridge = [x]
+    invalid = False
+    edge_found = {1: False, -1: False}
+    for i in range(1, max_bridge_length + 2):
+        for direction in (1, -1):
+            check_x = x + direction * i
+            if edge_found[direction]:
+                continue
+            if gap_mask[check_x, y]:
+                bridge.append(check_x)
+            if edge_mask[check_x, y]:
+                edge_found[direction] = True
+                continue
+            if not gap_mask[check_x, y] or not gap_mask[check_x, y + 1] or not gap_mask[check_x, y - 1]:
+                invalid = True
+
+    if len(bridge) > max_bridge_length or invalid or not edge_found[1] or not edge_found[-1]:
+        return None
+    return min(bridge), max(bridge)
+
+
+def make_maze_grid(width: int, height: int, seed: int) -> GridStorage:
+    # the same layout the maze generator bridges, corridors of blank between stone walls
+    grid = GridStorage(width, height, fill_tile_type = TileTypeEnum.BLANK)
+    line_grid_edge(grid, TileTypeEnum.BlueTile, 5)
+    generate_maze(grid, TileTypeEnum.BLANK, TileTypeEnum.STONE_TILES, 5, Random(seed))
+    replace_type(grid, TileTypeEnum.BlueTile, TileTypeEnum.BLANK)
+    return grid
+
+
+def get_scanned_bridges(grid: GridStorage, max_bridge_length: int):
+    gap_mask = grid.get_tile_type_mask(TileTypeEnum.BLANK)
+    edge_mask = grid.get_tile_type_mask(TileTypeEnum.STONE_TILES)
+    horizontal = {}
+    vertical = {}
+    for x in range(grid.width):
+        for y in range(grid.height):
+            horizontal_bridge = find_bridge_by_scanning(gap_mask, edge_mask, x, y, max_bridge_length)
+            if horizontal_bridge is not None:
+                horizontal[x, y] = horizontal_bridge
+            vertical_bridge = find_bridge_by_scanning(gap_mask.T, edge_mask.T, y, x, max_bridge_length)
+            if vertical_bridge is not None:
+                vertical[x, y] = vertical_bridge
+    return horizontal, vertical
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_find_bridges_along_first_axis_matches_scanning(seed):
+    grid = make_maze_grid(64, 48, seed)
+    horizontal, vertical = get_scanned_bridges(grid, 5)
+    gap_mask = grid.get_tile_type_mask(TileTypeEnum.BLANK)
+    edge_mask = grid.get_tile_type_mask(TileTypeEnum.STONE_TILES)
+
+    valid_horizontal, horizontal_starts, horizontal_ends = find_bridges_along_first_axis(gap_mask, edge_mask, 5)
+    valid_vertical, vertical_starts, vertical_ends = find_bridges_along_first_axis(gap_mask.T, edge_mask.T, 5)
+
+    assert len(horizontal) > 0 and len(vertical) > 0
+    assert set(zip(*np.nonzero(valid_horizontal))) == set(horizontal.keys())
+    assert set(zip(*np.nonzero(valid_vertical.T))) == set(vertical.keys())
+    for (x, y), (start, end) in horizontal.items():
+        assert (horizontal_starts[x, y], horizontal_ends[x, y]) == (start, end)
+    for (x, y), (start, end) in vertical.items():
+        assert (vertical_starts[y, x], vertical_ends[y, x]) == (start, end)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_bridge_gaps_fills_only_valid_bridges(seed):
+    grid = make_maze_grid(64, 48, seed)
+    original = grid.copy()
+    horizontal, vertical = get_scanned_bridges(grid, 5)
+
+    # a fill chance of 100 fills every bridge a gap cell picks
+    bridge_gaps(grid, TileTypeEnum.BLANK, TileTypeEnum.STONE_TILES, TileTypeEnum.RedTile, 5, 100, Random(seed))
+
+    could_fill = np.zeros((grid.width, grid.height), dtype=bool)
+    must_fill = np.zeros((grid.width, grid.height), dtype=bool)
+    for (x, y), (start, end) in horizontal.items():
+        could_fill[start:end + 1, y] = True
+        if (x, y) not in vertical.keys():
+            must_fill[start:end + 1, y] = True
+    for (x, y), (start, end) in vertical.items():
+        could_fill[x, start:end + 1] = True
+        if (x, y) not in horizontal.keys():
+            must_fill[x, start:end + 1] = True
+
+    filled = grid.get_tile_type_mask(TileTypeEnum.RedTile)
+    assert np.all(filled[must_fill])
+    assert not np.any(filled & ~could_fill)
+    assert np.array_equal(grid.tile_types[~filled], original.tile_types[~filled])
+
+
+def test_bridge_gaps_is_deterministic_for_a_seeded_random():
+    first_grid = make_maze_grid(64, 48, 0)
+    second_grid = first_grid.copy()
+
+    bridge_gaps(first_grid, TileTypeEnum.BLANK, TileTypeEnum.STONE_TILES, TileTypeEnum.RedTile, 5, 50, Random(9))
+    bridge_gaps(second_grid, TileTypeEnum.BLANK, TileTypeEnum.STONE_TILES, TileTypeEnum.RedTile, 5, 50, Random(9))
+
+    assert np.array_equal(first_grid.tile_types, second_grid.tile_types)
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("maze_path_distance", [1, 2, 5])
+def test_generate_maze_carves_one_spanning_tree(seed, maze_path_distance):
+    grid = GridStorage(41, 29, fill_tile_type = TileTypeEnum.BLANK)
+
+    generate_maze(grid, TileTypeEnum.BLANK, TileTypeEnum.STONE_TILES, maze_path_distance, Random(seed))
+
+    carved = grid.get_tile_type_mask(TileTypeEnum.STONE_TILES)
+    carved_x, carved_y = np.nonzero(carved)
+    # every lattice node in step with the start is reached once, and paths between them never cross, so the tree has node count - 1 paths
+    lattice_x = carved_x[0] % maze_path_distance
+    lattice_y = carved_y[carved_x == carved_x[0]].min() % maze_path_distance
+    lattice_nodes = np.zeros(carved.shape, dtype=bool)
+    lattice_nodes[lattice_x::maze_path_distance, lattice_y::maze_path_distance] = True
+    node_count = int(lattice_nodes.sum())
+
+    assert np.all(carved[lattice_nodes])
+    assert len(get_grid_regions(grid, TileTypeEnum.STONE_TILES)) == 1
+    assert int(carved.sum()) == 1 + (node_count - 1) * maze_path_distance
+
+
+def test_generate_maze_only_carves_from_base_tiles():
+    grid = GridStorage(40, 30, fill_tile_type = TileTypeEnum.BLANK)
+    line_grid_edge(grid, TileTypeEnum.BlueTile, 5)
+
+    generate_maze(grid, TileTypeEnum.BLANK, TileTypeEnum.STONE_TILES, 5, Random(3))
+
+    # the border is thicker than a path, so no path reaches into it
+    assert np.all(grid.get_tile_type_mask(TileTypeEnum.BlueTile)[:5, :])
+    assert np.all(grid.get_tile_type_mask(TileTypeEnum.BlueTile)[:, :5])
+    assert grid.get_tile_type_mask(TileTypeEnum.STONE_TILES).any()
+
+
+def test_generate_maze_is_deterministic_for_a_seeded_random():
+    first_grid = GridStorage(60, 45, fill_tile_type = TileTypeEnum.BLANK)
+    second_grid = GridStorage(60, 45, fill_tile_type = TileTypeEnum.BLANK)
+    third_grid = GridStorage(60, 45, fill_tile_type = TileTypeEnum.BLANK)
+
+    generate_maze(first_grid, TileTypeEnum.BLANK, TileTypeEnum.STONE_TILES, 5, Random(11))
+    generate_maze(second_grid, TileTypeEnum.BLANK, TileTypeEnum.STONE_TILES, 5, Random(11))
+    generate_maze(third_grid, TileTypeEnum.BLANK, TileTypeEnum.STONE_TILES, 5, Random(12))
+
+    assert np.array_equal(first_grid.tile_types, second_grid.tile_types)
+    assert not np.array_equal(first_grid.tile_types, third_grid.tile_types)
+
+
+def test_generate_maze_rejects_path_distances_below_one():
+    with pytest.raises(ValueError):
+        generate_maze(GridStorage(10, 10), TileTypeEnum.BLANK, TileTypeEnum.STONE_TILES, 0)
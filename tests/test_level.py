@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from level.grid_generator_helper import MazeGenerator
+from level.level import LevelData, save_level, load_level
+from level.level_cache import LevelCache
+
+
+def get_decoration_records(decorations):
+    return [(decoration.id, decoration.x_pos, decoration.y_pos, decoration.type.decorator_type, decoration.out_of_bounds) for decoration in decorations]
+
+
+@pytest.fixture(scope="module")
+def generated_level(tileset):
+    grid, collision_grid, decorations = MazeGenerator(120, 80, tileset, seed = 5).generate_grid()
+    return grid, collision_grid, decorations
+
+
+def test_save_then_load_keeps_tiles_collision_and_decorations(tileset, generated_level, tmp_path):
+    grid, collision_grid, decorations = generated_level
+    level_filename = str(tmp_path / "saved.level")
+
+    save_level(level_filename, LevelData.from_generated(grid.tile_types, collision_grid, decorations, {"tileset_filename": "test_tileset.json", "seed": 5}))
+    level_data = load_level(level_filename)
+
+    assert (level_data.width, level_data.height) == (120, 80)
+    assert np.array_equal(level_data.tile_types, grid.tile_types)
+    assert np.array_equal(level_data.collision_grid, collision_grid)
+    assert level_data.metadata == {"tileset_filename": "test_tileset.json", "seed": 5}
+    assert len(decorations) > 0
+    assert get_decoration_records(level_data.create_decorations(tileset)) == get_decoration_records(decorations)
+
+
+def test_create_decorations_in_batches_matches_all_at_once(tileset, generated_level, tmp_path):
+    grid, collision_grid, decorations = generated_level
+    level_filename = str(tmp_path / "batched.level")
+    save_level(level_filename, LevelData.from_generated(grid.tile_types, collision_grid, decorations, {}))
+    level_data = load_level(level_filename)
+
+    batched = []
+    for start in range(0, len(decorations), 7):
+        batched.extend(level_data.create_decorations(tileset, start, start + 7))
+
+    assert get_decoration_records(batched) == get_decoration_records(decorations)
+
+
+def test_load_level_rejects_other_files(tmp_path):
+    not_a_level = tmp_path / "not_a_level.level"
+    not_a_level.write_bytes(b"\0" * 256)
+
+    with pytest.raises(ValueError):
+        load_level(str(not_a_level))
+
+
+def test_same_seed_generates_the_same_level(tileset, generated_level):
+    grid, collision_grid, decorations = generated_level
+    other_grid, other_collision_grid, other_decorations = MazeGenerator(120, 80, tileset, seed = 5).generate_grid()
+    different_grid, different_collision_grid, different_decorations = MazeGenerator(120, 80, tileset, seed = 6).generate_grid()
+
+    assert np.array_equal(other_grid.tile_types, grid.tile_types)
+    assert np.array_equal(other_collision_grid, collision_grid)
+    assert get_decoration_records(other_decorations) == get_decoration_records(decorations)
+    assert not np.array_equal(different_grid.tile_types, grid.tile_types)
+
+
+def test_level_cache_returns_the_saved_level(tileset, generated_level, tmp_path):
+    grid, collision_grid, decorations = generated_level
+    level_cache = LevelCache(str(tmp_path / "cache"))
+
+    assert level_cache.load(5, 120, 80, "test_tileset.json") is None
+    level_cache.save(5, 120, 80, "test_tileset.json", LevelData.from_generated(grid.tile_types, collision_grid, decorations, {"seed": 5}))
+    level_data = level_cache.load(5, 120, 80, "test_tileset.json")
+
+    assert np.array_equal(level_data.tile_types, grid.tile_types)
+    assert np.array_equal(level_data.collision_grid, collision_grid)
+    assert get_decoration_records(level_data.create_decorations(tileset)) == get_decoration_records(decorations)
+    assert level_cache.load(6, 120, 80, "test_tileset.json") is None
@@ -16,6 +16,12 @@ class UIText(UIElement):
 
     def get_size(self) -> Tuple[float, float]:
         return FontRegistery.get_font(self.size).size(self.text)
+
+    def get_rect(self) -> pygame.Rect:
+        est_width, est_height = self.get_size()
+        if self.center_on_position:
+            return pygame.Rect(self.x_pos - est_width/2, self.y_pos - est_height/2, est_width, est_height)
+        return pygame.Rect(self.x_pos, self.y_pos, est_width, est_height)
     
     def render(self, screen):
 